@@ -0,0 +1,75 @@
+"""Compare retraining from scratch against incremental fine-tuning.
+
+Every configuration runs the active learning loop once with seed=SEED, so all
+of them share the initial labeled set and differ only in how the classifier is
+updated. Reported are the test accuracy after the last query, its mean over all
+iterations (area under the learning curve) and the time to completion.
+"""
+
+import numpy as np
+from core.constants import AugmentationMethods, Datasets, TransformerModels
+from core.loop import SEED, run_active_learning_loop
+from script import create_raw_set
+
+num_queries = 50
+num_samples = 20
+query_strategy = "AugmentedSearchSpaceExtensionQueryStrategy"
+chosen_dataset = Datasets.TWEET.value
+augmentation_method = AugmentationMethods.RANDOM_SWAP.value
+# (incremental_epochs, replay_size, full_retrain_every), None is from scratch.
+configurations = [
+    (None, None, None),
+    (2, None, None),
+    (2, 100, None),
+    (2, 100, 10),
+]
+
+
+def run_configuration(
+    raw_test,
+    raw_train,
+    augmented_indices,
+    incremental_epochs,
+    replay_size,
+    full_retrain_every,
+):
+    results, _ = run_active_learning_loop(
+        raw_test,
+        raw_train,
+        augmented_indices,
+        num_queries=num_queries,
+        num_samples=num_samples,
+        query_strategy=query_strategy,
+        model=TransformerModels.BERT_TINY.value,
+        incremental_epochs=incremental_epochs,
+        replay_size=replay_size,
+        full_retrain_every=full_retrain_every,
+        seed=SEED,
+    )
+    test_accuracies = np.array(results["test_accuracies"])
+    return (
+        test_accuracies[-1],
+        test_accuracies.mean(),
+        results["elapsed_seconds"][-1],
+    )
+
+
+if __name__ == "__main__":
+    raw_test, raw_train, augmented_indices = create_raw_set(
+        chosen_dataset, augmentation_method
+    )
+    rows = []
+    for configuration in configurations:
+        final_acc, mean_acc, seconds = run_configuration(
+            raw_test, raw_train, augmented_indices, *configuration
+        )
+        rows.append((*configuration, final_acc, mean_acc, seconds))
+
+    print(f"{query_strategy} on {chosen_dataset} with {num_queries} queries")
+    print("epochs | replay | full every | final test acc | mean test acc | seconds")
+    for epochs, replay, full_every, final_acc, mean_acc, seconds in rows:
+        print(
+            f"{str(epochs or 'scratch'):>6} | {str(replay or 'all'):>6} | "
+            f"{str(full_every or '-'):>10} | {final_acc:>14.4f} | "
+            f"{mean_acc:>13.4f} | {seconds:>7.1f}"
+        )
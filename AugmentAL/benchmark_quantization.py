@@ -0,0 +1,97 @@
+"""Compare pool scoring with the fp32 classifier against its int8 scoring copy.
+
+The classifier is warm started on CPU and then updated with randomly queried
+samples. After every update the whole training pool is scored by the fp32
+classifier and by a new int8 copy. Reported are the throughput of both, the
+time to quantize, the agreement of the predicted labels, the Spearman
+correlation of the breaking ties margins and the overlap of the num_samples
+rows, which breaking ties would query.
+"""
+
+from time import perf_counter
+
+import numpy as np
+from core.constants import AugmentationMethods, Datasets, TransformerModels
+from core.core import create_active_learner, create_small_text_dataset
+from core.quantization import int8_scoring_copy
+from scipy.stats import spearmanr
+from script import create_raw_set
+from small_text import RandomSampling
+
+num_updates = 5
+num_samples = 20
+chosen_dataset = Datasets.TWEET.value
+augmentation_method = AugmentationMethods.RANDOM_SWAP.value
+model = TransformerModels.BERT.value
+
+
+def margins(proba: np.ndarray) -> np.ndarray:
+    """Difference of the two highest probabilities, low margins are queried."""
+    top_two = np.sort(proba, axis=1)[:, -2:]
+    return top_two[:, 1] - top_two[:, 0]
+
+
+def compare(classifier, train) -> dict:
+    start = perf_counter()
+    proba_fp32 = classifier.predict_proba(train)
+    fp32_seconds = perf_counter() - start
+
+    start = perf_counter()
+    scoring_classifier = int8_scoring_copy(classifier)
+    quantize_seconds = perf_counter() - start
+
+    start = perf_counter()
+    proba_int8 = scoring_classifier.predict_proba(train)
+    int8_seconds = perf_counter() - start
+
+    margins_fp32, margins_int8 = margins(proba_fp32), margins(proba_int8)
+    queried_fp32 = np.argpartition(margins_fp32, num_samples)[:num_samples]
+    queried_int8 = np.argpartition(margins_int8, num_samples)[:num_samples]
+    return {
+        "fp32_rows_per_second": len(train) / fp32_seconds,
+        "int8_rows_per_second": len(train) / int8_seconds,
+        "quantize_seconds": quantize_seconds,
+        "label_agreement": np.mean(
+            proba_fp32.argmax(axis=1) == proba_int8.argmax(axis=1)
+        ),
+        "margin_spearman": spearmanr(margins_fp32, margins_int8)[0],
+        "query_overlap": len(np.intersect1d(queried_fp32, queried_int8)) / num_samples,
+    }
+
+
+if __name__ == "__main__":
+    raw_test, raw_train, augmented_indices = create_raw_set(
+        chosen_dataset, augmentation_method
+    )
+    train = create_small_text_dataset(raw_train)
+    active_learner, _ = create_active_learner(
+        train_set=train,
+        num_classes=raw_train.features["label"].num_classes,
+        training_indices=augmented_indices.originals if augmented_indices else None,
+        query_strategy=RandomSampling(),
+        model=model,
+        device="cpu",
+    )
+    classifier = active_learner.classifier.classifier
+
+    rows = []
+    for update in range(num_updates + 1):
+        if update > 0:
+            indices_queried = active_learner.query(num_samples=num_samples)
+            active_learner.update(train.y[indices_queried])
+            classifier = active_learner.classifier.classifier
+        rows.append(compare(classifier, train))
+
+    print(f"{model} on {chosen_dataset}, {len(train)} pool rows, CPU")
+    print(
+        "update | fp32 rows/s | int8 rows/s | speedup | quantize s | "
+        "label agreement | margin spearman | query overlap"
+    )
+    for update, row in enumerate(rows):
+        print(
+            f"{update:>6} | {row['fp32_rows_per_second']:>11.1f} | "
+            f"{row['int8_rows_per_second']:>11.1f} | "
+            f"{row['int8_rows_per_second'] / row['fp32_rows_per_second']:>7.2f} | "
+            f"{row['quantize_seconds']:>10.2f} | {row['label_agreement']:>15.4f} | "
+            f"{row['margin_spearman']:>15.4f} | {row['query_overlap']:>13.2f}"
+        )
@@ -0,0 +1,67 @@
+"""Compare full-pool scoring against random pool subsampling.
+
+For every configuration the active learning loop is run once with the same
+seed, so all of them start from the same warm start. The stopping criteria only
+predict the originals, otherwise their prediction over the whole pool would
+serve the subsets from the cache and hide any saving. The selection quality is
+reported as the test accuracy after the last query and averaged over all
+iterations (area under the learning curve), next to the wall-clock time of the
+whole loop.
+"""
+
+from datetime import datetime
+
+import numpy as np
+from core.constants import AugmentationMethods, Datasets, TransformerModels
+from core.loop import SEED, run_active_learning_loop
+from script import create_raw_set
+
+num_queries = 10
+num_samples = 20
+query_strategy = "AugmentedSearchSpaceExtensionQueryStrategy"
+chosen_dataset = Datasets.TWEET.value
+augmentation_method = AugmentationMethods.RANDOM_SWAP.value
+# (subsample_size, stratified), None is the full-pool baseline.
+configurations = [(None, False), (2000, False), (2000, True), (5000, False)]
+
+
+def run_configuration(
+    raw_test, raw_train, augmented_indices, subsample_size, stratified
+):
+    start_time = datetime.now()
+    results, _ = run_active_learning_loop(
+        raw_test,
+        raw_train,
+        augmented_indices,
+        num_queries=num_queries,
+        num_samples=num_samples,
+        query_strategy=query_strategy,
+        model=TransformerModels.BERT_TINY.value,
+        subsample_size=subsample_size,
+        stratified_subsample=stratified,
+        stopping_set="originals",
+        seed=SEED,
+    )
+    duration = datetime.now() - start_time
+    test_accuracies = np.array(results["test_accuracies"])
+    return test_accuracies[-1], test_accuracies.mean(), duration
+
+
+if __name__ == "__main__":
+    raw_test, raw_train, augmented_indices = create_raw_set(
+        chosen_dataset, augmentation_method
+    )
+    rows = []
+    for subsample_size, stratified in configurations:
+        final_acc, mean_acc, duration = run_configuration(
+            raw_test, raw_train, augmented_indices, subsample_size, stratified
+        )
+        rows.append((subsample_size, stratified, final_acc, mean_acc, duration))
+
+    print(f"{query_strategy} on {chosen_dataset} with {num_queries} queries")
+    print("subsample_size | stratified | final test acc | mean test acc | wall time")
+    for subsample_size, stratified, final_acc, mean_acc, duration in rows:
+        print(
+            f"{str(subsample_size or 'full'):>14} | {str(stratified):>10} | "
+            f"{final_acc:>14.4f} | {mean_acc:>13.4f} | {duration}"
+        )
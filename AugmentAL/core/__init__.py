@@ -3,3 +3,16 @@ from . import core
 from . import loop
 from . import query_strategies
 from . import augment
+from . import groups
+from . import pool
+from . import views
+from . import cache
+from . import stopping
+from . import incremental
+from . import checkpoint
+from . import results
+from . import profiling
+from . import tokenization
+from . import bucketing
+from . import registry
+from . import quantization
@@ -1,11 +1,13 @@
+import hashlib
 from pathlib import Path
 import multiprocessing
-import json
 
 import datasets
 import nlpaug
 import nlpaug.augmenter.word as naw
+from core.groups import AugmentationGroups
 from datasets import concatenate_datasets
+import numpy as np
 
 aug = naw.SynonymAug(aug_src="wordnet")
 
@@ -16,17 +18,15 @@ def create_augmented_dataset(
     feature: str = "text",
     n: int = 3,
     saving_path: str = None,
-) -> set[datasets.Dataset, dict[int, list[int]]]:
+) -> set[datasets.Dataset, AugmentationGroups]:
     print("Starting augmentation")
-    augmented_indices = {}
 
     # Because we multiply create augmented sets
     # based on one set and then concatenate the newly
     # created virtual sets, the augmented_indices
     # always follow this pattern.
     num_rows = dataset.num_rows
-    for x in range(num_rows):
-        augmented_indices[int(x)] = [int(x + (num_rows * (y + 1))) for y in range(n)]
+    augmented_indices = AugmentationGroups.from_repeated_blocks(num_rows, n)
     print(f"Num augmentations in create_augmented_dataset: {n}")
     augmented_sets = [
         dataset.map(
@@ -53,7 +53,57 @@ def create_augmented_dataset(
     print(f"Trying to save on the saving path {saving_path}.")
     if saving_path:
         augmented_full_set.save_to_disk(saving_path)
-        with open(f"{saving_path}/augmented_indices.json", "w") as f:
-            f.write(json.dumps(augmented_indices))
+        augmented_indices.save(saving_path)
 
     return augmented_full_set, augmented_indices
+
+
+def text_hashes(dataset: datasets.Dataset, feature: str = "text") -> np.ndarray:
+    """A 64 bit content hash of the feature of every row."""
+    return np.fromiter(
+        (
+            int.from_bytes(
+                hashlib.blake2b(text.encode(), digest_size=8).digest(), "little"
+            )
+            for text in dataset[feature]
+        ),
+        dtype=np.uint64,
+        count=dataset.num_rows,
+    )
+
+
+def deduplicate_augmented_dataset(
+    dataset: datasets.Dataset,
+    augmented_indices: AugmentationGroups,
+    feature: str = "text",
+) -> tuple[datasets.Dataset, AugmentationGroups, dict]:
+    """Drop augmented samples, which are exact copies of their original or of
+    another augmented sample of the same group, e.g. if the augmenter did not
+    find a word to replace. Duplicates only add cost to every scoring pass,
+    while their predictions equal the ones of the kept copy.
+
+    Args:
+        dataset (datasets.Dataset): The augmented full set.
+        augmented_indices (AugmentationGroups): The groups of the dataset.
+        feature (str, optional): The compared column. Defaults to "text".
+
+    Returns:
+        tuple[datasets.Dataset, AugmentationGroups, dict]: The deduplicated set,
+            its groups and the number of rows before and after.
+    """
+    augmented_indices = AugmentationGroups.create(augmented_indices)
+    duplicates = augmented_indices.duplicate_members(text_hashes(dataset, feature))
+    kept_rows = np.setdiff1d(np.arange(dataset.num_rows), duplicates)
+
+    stats = {"rows_before": dataset.num_rows, "rows_after": len(kept_rows)}
+    print(
+        f"Deduplication removed {len(duplicates)} of {dataset.num_rows} rows "
+        f"({100 * len(duplicates) / max(dataset.num_rows, 1):.1f}%)."
+    )
+    if len(duplicates) == 0:
+        return dataset, augmented_indices, stats
+    return (
+        dataset.select(kept_rows),
+        augmented_indices.subset(kept_rows),
+        stats,
+    )
@@ -0,0 +1,75 @@
+from functools import partial
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+INDEX_TEXT = 0
+INDEX_MASK = 1
+
+
+def sequence_lengths(data) -> np.ndarray:
+    """Number of columns up to the last attended token of every row.
+
+    Args:
+        data (Sequence): Rows of a TransformersDataset, each holding input ids and
+            an attention mask of shape [1, max_length].
+
+    Returns:
+        np.ndarray: The length of every row, rows without any attended token
+            have the full length.
+    """
+    masks = torch.cat([row[INDEX_MASK] for row in data], dim=0).numpy() != 0
+    # Distance of the last attended token from the end of the row.
+    trailing = np.argmax(masks[:, ::-1], axis=1)
+    return masks.shape[1] - trailing
+
+
+def length_buckets(lengths: np.ndarray, batch_size: int) -> list[np.ndarray]:
+    """Split the rows into batches of similar length, each sorted by length.
+
+    Returns:
+        list[np.ndarray]: Row indices of every batch, shortest batches first.
+    """
+    order = np.argsort(lengths, kind="stable")
+    return [
+        order[start : start + batch_size] for start in range(0, len(order), batch_size)
+    ]
+
+
+def bucketed_predict_proba(classifier, dataset) -> np.ndarray:
+    """predict_proba of a TransformerBasedClassification, which pads every batch
+    only to its longest row instead of max_length.
+
+    The rows are sorted by length into batches of mini_batch_size, so short texts
+    are batched together and the padding, which is cut off, does not have to go
+    through the model. The probabilities are returned in the order of dataset.
+
+    Args:
+        classifier (TransformerBasedClassification): A fitted classifier.
+        dataset (TransformersDataset | IndexedDatasetView): Right padded
+            rows, as created by create_small_text_dataset.
+
+    Returns:
+        np.ndarray: Probabilities of shape (num_samples, num_classes).
+    """
+    data = dataset.data
+    proba = np.empty((len(data), classifier.num_classes), dtype=float)
+    if len(data) == 0:
+        return proba
+
+    lengths = sequence_lengths(data)
+    logits_transform = (
+        torch.sigmoid if classifier.multi_label else partial(F.softmax, dim=1)
+    )
+    classifier.model.eval()
+    with torch.no_grad():
+        for batch in length_buckets(lengths, classifier.mini_batch_size):
+            width = int(lengths[batch].max())
+            text = torch.cat([data[i][INDEX_TEXT][:, :width] for i in batch], dim=0)
+            masks = torch.cat([data[i][INDEX_MASK][:, :width] for i in batch], dim=0)
+            outputs = classifier.model(
+                text.to(classifier.device), attention_mask=masks.to(classifier.device)
+            )
+            proba[batch] = logits_transform(outputs.logits).to("cpu").numpy()
+    return proba
@@ -0,0 +1,219 @@
+import threading
+
+import numpy as np
+from core.bucketing import bucketed_predict_proba
+from core.quantization import SCORING_BACKENDS
+from core.views import IndexedDatasetView
+from small_text import PoolBasedActiveLearner
+from small_text.exceptions import LearnerNotInitializedException
+from small_text.utils.data import list_length
+
+
+class PredictionCache:
+    """Caches the class probabilities of the current classifier per dataset.
+
+    Entries are keyed by the identity of the dataset and only valid for one
+    classifier version. The version is increased by invalidate, which has to be
+    called whenever the classifier is retrained. Probabilities for a
+    IndexedDatasetView are sliced out of the probabilities of the whole
+    underlying dataset if those are cached already, so the training pool is
+    scored at most once per version. The cache can be shared between threads, a
+    dataset requested by several threads at once is only predicted by the first.
+    With dynamic_padding, datasets are predicted in batches of similar length,
+    which are only padded to their longest row.
+    """
+
+    def __init__(self, dynamic_padding: bool = False) -> None:
+        """
+        Args:
+            dynamic_padding (bool, optional): Predict with bucketed_predict_proba
+                instead of the predict_proba of the classifier. Defaults to False.
+        """
+        self.dynamic_padding = dynamic_padding
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        # id(dataset) -> (dataset, proba), the dataset is kept so that its id
+        # can not be reused by another object while the entry is alive.
+        self._entries = {}
+        # id(dataset) -> event set once the prediction in flight is cached.
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+    def predict_proba(self, clf, dataset) -> np.ndarray:
+        while isinstance(dataset, IndexedDatasetView):
+            with self._lock:
+                entry = self._entries.get(id(dataset.dataset))
+                if entry is not None and entry[0] is dataset.dataset:
+                    self.hits += 1
+                    return entry[1][dataset.global_indices]
+                in_flight = self._in_flight.get(id(dataset.dataset))
+            if in_flight is None:
+                break
+            # The whole dataset is being predicted, slice the view out of it.
+            in_flight.wait()
+        return self._get(clf, dataset).copy()
+
+    def predict(self, clf, dataset) -> np.ndarray:
+        return np.argmax(self.predict_proba(clf, dataset), axis=1)
+
+    def _get(self, clf, dataset) -> np.ndarray:
+        key = id(dataset)
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] is dataset:
+                    self.hits += 1
+                    return entry[1]
+                in_flight = self._in_flight.get(key)
+                if in_flight is None:
+                    self.misses += 1
+                    in_flight = self._in_flight[key] = threading.Event()
+                    break
+            # Another thread predicts the dataset, wait and look again.
+            in_flight.wait()
+
+        try:
+            if self.dynamic_padding:
+                proba = bucketed_predict_proba(clf, dataset)
+            else:
+                proba = clf.predict_proba(dataset)
+            with self._lock:
+                self._entries[key] = (dataset, proba)
+            return proba
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            in_flight.set()
+
+
+class CachingClassifier:
+    """Wraps a classifier, so that predict and predict_proba are served from a
+    PredictionCache. Everything else is forwarded to the wrapped classifier.
+    """
+
+    def __init__(self, classifier, cache: PredictionCache) -> None:
+        self.classifier = classifier
+        self.cache = cache
+
+    def __getattr__(self, name):
+        if name in ("classifier", "cache"):
+            raise AttributeError(name)
+        return getattr(self.classifier, name)
+
+    def predict_proba(self, data_set, **kwargs) -> np.ndarray:
+        if kwargs:
+            # E.g. dropout sampling, which yields different probabilities.
+            return self.classifier.predict_proba(data_set, **kwargs)
+        return self.cache.predict_proba(self.classifier, data_set)
+
+    def predict(self, data_set, return_proba: bool = False):
+        proba = self.predict_proba(data_set)
+        predictions = np.argmax(proba, axis=1)
+        if return_proba:
+            return predictions, proba
+        return predictions
+
+
+class CachedPoolBasedActiveLearner(PoolBasedActiveLearner):
+    """PoolBasedActiveLearner, whose classifier shares one PredictionCache between
+    the query strategy, the evaluation and the stopping criteria. The cache is
+    invalidated every time the classifier is retrained, e.g. on update.
+
+    With a scoring_backend, queries and stopping criteria are served by a copy of
+    the classifier created by the backend, e.g. an int8 quantized one, which has
+    its own cache. The copy is created on first use after every retrain, while
+    training and evaluation use the full precision classifier.
+    """
+
+    # Labeling state, which a RunCheckpoint saves next to the classifier.
+    checkpoint_attributes = ("indices_labeled", "indices_ignored", "y")
+
+    def __init__(
+        self,
+        *args,
+        prediction_cache: PredictionCache = None,
+        scoring_backend: str | None = None,
+        **kwargs,
+    ):
+        if scoring_backend is not None and scoring_backend not in SCORING_BACKENDS:
+            raise ValueError(
+                f"Unknown scoring backend {scoring_backend}, "
+                f"choose one of {list(SCORING_BACKENDS)}."
+            )
+        super().__init__(*args, **kwargs)
+        self.prediction_cache = (
+            prediction_cache if prediction_cache is not None else PredictionCache()
+        )
+        self.scoring_backend = scoring_backend
+        self.scoring_cache = PredictionCache(
+            dynamic_padding=self.prediction_cache.dynamic_padding
+        )
+        self._scoring_clf = None
+        self._scoring_lock = threading.Lock()
+
+    @property
+    def scoring_classifier(self):
+        """The classifier used by queries and stopping criteria."""
+        if self.scoring_backend is None or self._clf is None:
+            return self._clf
+        # Queries and stopping criteria of one iteration may run in parallel.
+        with self._scoring_lock:
+            if self._scoring_clf is None:
+                classifier = self._clf
+                if isinstance(classifier, CachingClassifier):
+                    classifier = classifier.classifier
+                self._scoring_clf = CachingClassifier(
+                    SCORING_BACKENDS[self.scoring_backend](classifier),
+                    self.scoring_cache,
+                )
+            return self._scoring_clf
+
+    def invalidate_predictions(self) -> None:
+        """Drop the cached predictions and the scoring copy of the classifier. Has
+        to be called whenever the classifier changes.
+        """
+        self.prediction_cache.invalidate()
+        self.scoring_cache.invalidate()
+        with self._scoring_lock:
+            self._scoring_clf = None
+
+    def query(self, num_samples=10, representation=None, query_strategy_kwargs=dict()):
+        """PoolBasedActiveLearner.query, which scores with the scoring_classifier."""
+        if self._index_to_position is None:
+            raise LearnerNotInitializedException()
+
+        size = list_length(self.dataset)
+        if representation is not None and size != list_length(representation):
+            raise ValueError(
+                "Number of rows of alternative representation x must match the "
+                "train set (dim 0)."
+            )
+
+        self.mask = np.ones(size, bool)
+        self.mask[np.concatenate([self.indices_labeled, self.indices_ignored])] = False
+        indices = np.arange(size)
+
+        representation = self.dataset if representation is None else representation
+        self.indices_queried = self.query_strategy.query(
+            self.scoring_classifier,
+            representation,
+            indices[self.mask],
+            self.indices_labeled,
+            self.y,
+            n=num_samples,
+            **query_strategy_kwargs,
+        )
+        return self.indices_queried
+
+    def _retrain(self, *args, **kwargs):
+        self.invalidate_predictions()
+        if isinstance(self._clf, CachingClassifier):
+            self._clf = self._clf.classifier
+        super()._retrain(*args, **kwargs)
+        self._clf = CachingClassifier(self._clf, self.prediction_cache)
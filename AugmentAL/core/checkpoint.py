@@ -0,0 +1,217 @@
+import copy
+import os
+import random
+from pathlib import Path
+
+import numpy as np
+import torch
+from core.cache import CachingClassifier
+
+
+def atomic_save(obj, path: Path) -> None:
+    """Write obj with torch.save, so that path holds either the old or the new file.
+
+    The data is written to a temporary file in the same directory, flushed to
+    disk and then renamed onto path, which is atomic on POSIX file systems.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, "wb") as f:
+        torch.save(obj, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    # Persist the rename itself.
+    directory = os.open(path.parent, os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+
+
+def get_random_states() -> dict:
+    states = {
+        "python": random.getstate(),
+        "numpy": np.random.get_state(),
+        "torch": torch.get_rng_state(),
+    }
+    if torch.cuda.is_available():
+        states["torch_cuda"] = torch.cuda.get_rng_state_all()
+    return states
+
+
+def set_random_states(states: dict) -> None:
+    random.setstate(states["python"])
+    np.random.set_state(states["numpy"])
+    torch.set_rng_state(states["torch"])
+    if "torch_cuda" in states and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(states["torch_cuda"])
+
+
+def get_strategy_generators(query_strategy) -> list[np.random.Generator]:
+    """Random generators along the chain of base strategies, e.g. of subsampling."""
+    generators = []
+    strategy = query_strategy
+    while strategy is not None:
+        if isinstance(getattr(strategy, "rng", None), np.random.Generator):
+            generators.append(strategy.rng)
+        strategy = getattr(strategy, "base_strategy", None)
+    return generators
+
+
+def get_learner_state(active_learner) -> tuple[dict, object]:
+    """The labeling state of the active learner and its unwrapped classifier."""
+    classifier = active_learner._clf
+    if isinstance(classifier, CachingClassifier):
+        classifier = classifier.classifier
+    learner_state = {
+        name: getattr(active_learner, name)
+        for name in active_learner.checkpoint_attributes
+    }
+    return learner_state, classifier
+
+
+def set_learner_state(active_learner, learner_state: dict, classifier) -> None:
+    for name, value in learner_state.items():
+        setattr(active_learner, name, value)
+    active_learner._index_to_position = active_learner._build_index_to_position_dict()
+    active_learner.invalidate_predictions()
+    active_learner._clf = CachingClassifier(classifier, active_learner.prediction_cache)
+
+
+class WarmStartSnapshot:
+    """Tokenized datasets and the warm-started active learner, shared by runs.
+
+    The snapshot is taken right after the warm start. Every fork restores a deep
+    copy of the labeling state and the classifier into a new active learner,
+    together with the random states, so each run continues exactly like a run
+    with its own warm start and the same seed would.
+    """
+
+    def __init__(self, train, test, active_learner, indices_labeled) -> None:
+        """
+        Args:
+            train (TransformersDataset): The tokenized training set.
+            test (TransformersDataset): The tokenized test set.
+            active_learner (CachedPoolBasedActiveLearner): The warm-started learner.
+            indices_labeled (np.ndarray): The indices labeled by the warm start.
+        """
+        self.train = train
+        self.test = test
+        self.indices_labeled = np.array(indices_labeled)
+        self.learner_state, self.classifier = copy.deepcopy(
+            get_learner_state(active_learner)
+        )
+        self.random_states = get_random_states()
+
+    def fork(self, active_learner) -> np.ndarray:
+        """Restore the snapshot into a new active learner of the same kind.
+
+        Returns:
+            np.ndarray: The indices labeled by the warm start.
+        """
+        learner_state, classifier = copy.deepcopy((self.learner_state, self.classifier))
+        set_learner_state(active_learner, learner_state, classifier)
+        set_random_states(self.random_states)
+        return self.indices_labeled.copy()
+
+
+def get_run_random_states(active_learner) -> dict:
+    """The global random states and those of the query strategies of a run."""
+    return {
+        "random_states": get_random_states(),
+        "strategy_generators": [
+            generator.bit_generator.state
+            for generator in get_strategy_generators(active_learner.query_strategy)
+        ],
+    }
+
+
+class RunCheckpoint:
+    """Latest state of one active learning run, kept in a run directory.
+
+    A checkpoint holds the classifier, the labeling state of the active learner,
+    all random states and the histories of the loop. It is written after every
+    iteration with atomic_save, so killing the run while checkpointing leaves
+    the previous checkpoint intact.
+    """
+
+    file_name = "checkpoint.pt"
+
+    def __init__(self, run_dir: str | Path, run_key: str = "") -> None:
+        """
+        Args:
+            run_dir (str | Path): Directory of the run, created if missing.
+            run_key (str, optional): Identifies the configuration of the run. A
+                checkpoint of another configuration is never resumed.
+        """
+        self.run_dir = Path(run_dir)
+        self.run_dir.mkdir(parents=True, exist_ok=True)
+        self.path = self.run_dir / self.file_name
+        self.run_key = run_key
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def save(
+        self,
+        iteration: int,
+        active_learner,
+        loop_state: dict,
+        random_states: dict | None = None,
+    ) -> None:
+        """
+        Args:
+            iteration (int): Number of finished queries.
+            active_learner (CachedPoolBasedActiveLearner): The active learner.
+            loop_state (dict): Histories and further state of the loop.
+            random_states (dict | None, optional): Random states taken with
+                get_run_random_states at the end of the iteration, if the next
+                iteration already started. Defaults to the current states.
+        """
+        learner_state, classifier = get_learner_state(active_learner)
+        if random_states is None:
+            random_states = get_run_random_states(active_learner)
+        atomic_save(
+            {
+                "run_key": self.run_key,
+                "iteration": iteration,
+                "classifier": classifier,
+                "learner": learner_state,
+                **random_states,
+                "loop": loop_state,
+            },
+            self.path,
+        )
+
+    def restore(self, active_learner) -> dict | None:
+        """Restore the active learner and the random states from the checkpoint.
+
+        Args:
+            active_learner (CachedPoolBasedActiveLearner): A new active learner
+                with the same configuration, it does not have to be initialized.
+
+        Returns:
+            dict | None: The iteration and loop state of the checkpoint, None if
+                there is no checkpoint to resume.
+        """
+        if not self.exists():
+            return None
+        checkpoint = torch.load(self.path, weights_only=False)
+        if checkpoint["run_key"] != self.run_key:
+            raise ValueError(
+                f"Checkpoint in {self.run_dir} belongs to run "
+                f"{checkpoint['run_key']}, not to {self.run_key}."
+            )
+
+        set_learner_state(
+            active_learner, checkpoint["learner"], checkpoint["classifier"]
+        )
+
+        set_random_states(checkpoint["random_states"])
+        generators = get_strategy_generators(active_learner.query_strategy)
+        for generator, state in zip(generators, checkpoint["strategy_generators"]):
+            generator.bit_generator.state = state
+
+        print(f"Resuming {self.run_key} after iteration {checkpoint['iteration']}")
+        return {"iteration": checkpoint["iteration"], "loop": checkpoint["loop"]}
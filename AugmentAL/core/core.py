@@ -2,15 +2,24 @@ import datasets
 import numpy as np
 import os
 import torch
+from contextlib import nullcontext
+from core.cache import CachedPoolBasedActiveLearner, PredictionCache
 from core.constants import TransformerModels
+from core.incremental import IncrementalPoolBasedActiveLearner
+from core.pool import PoolState
+from core.profiling import PhaseProfiler
+from core.registry import (
+    MODEL_REGISTRY,
+    RegistryTransformerBasedClassificationFactory,
+)
+from core.tokenization import TokenizationCache
 from matplotlib import rcParams
-from sklearn.metrics import accuracy_score
+from sklearn.metrics import accuracy_score, f1_score, recall_score
 from small_text import (
     Classifier,
     PoolBasedActiveLearner,
     PredictionEntropy,
     QueryStrategy,
-    TransformerBasedClassificationFactory,
     TransformerModelArguments,
     TransformersDataset,
     random_initialization_balanced,
@@ -20,7 +29,6 @@ from small_text import (
 #     SetFitClassificationFactory,
 # )
 # from small_text.integrations.transformers.classifiers.setfit import SetFitModelArguments
-from transformers import AutoTokenizer
 
 # CONSTANTS
 SEED = 2022
@@ -35,31 +43,57 @@ np.random.seed(SEED)
 
 def create_small_text_dataset(
     dataset: datasets.Dataset,
+    tokenization_cache: TokenizationCache | None = None,
+    max_length: int = 60,
+    use_tokenization_cache: bool = True,
 ) -> set[TransformersDataset, TransformersDataset, int]:
     """Get specified hf dataset and transform to small text train and test set
 
     Args:
         dataset (datasets.Dataset): An hf dataset partition.
+        tokenization_cache (TokenizationCache | None, optional): Cache of the
+            tokens. Defaults to a TokenizationCache in its default directory.
+        max_length (int, optional): Maximal number of tokens. Defaults to 60.
+        use_tokenization_cache (bool, optional): False always tokenizes in memory.
+            Defaults to True.
 
     Returns:
         tuple[TransformersDataset, TransformersDataset, int]: A train and a test set and the num_labels
     """
-    tokenizer = AutoTokenizer.from_pretrained(
-        TransformerModels.BERT.value, cache_dir=os.getenv("HF_CACHE")
-    )
+    tokenizer_name = TransformerModels.BERT.value
+
+    def create_tokenizer():
+        return MODEL_REGISTRY.tokenizer(tokenizer_name, cache_dir=os.getenv("HF_CACHE"))
 
     num_classes = dataset.features["label"].num_classes
 
     # TRANSFORM INTO SMALL TEXT
     target_labels = np.arange(num_classes)
 
-    return TransformersDataset.from_arrays(
-        dataset["text"],
-        dataset["label"],
-        tokenizer,
-        max_length=60,
-        target_labels=target_labels,
+    if not use_tokenization_cache:
+        return TransformersDataset.from_arrays(
+            dataset["text"],
+            dataset["label"],
+            create_tokenizer(),
+            max_length=max_length,
+            target_labels=target_labels,
+        )
+
+    if tokenization_cache is None:
+        tokenization_cache = TokenizationCache()
+    input_ids, attention_mask = tokenization_cache.get_or_tokenize(
+        dataset, create_tokenizer, tokenizer_name, max_length
     )
+    # Every row is a view into the memory maps, like the rows of from_arrays.
+    data = [
+        (
+            torch.from_numpy(input_ids[i : i + 1]),
+            torch.from_numpy(attention_mask[i : i + 1]),
+            label,
+        )
+        for i, label in enumerate(dataset["label"])
+    ]
+    return TransformersDataset(data, target_labels=target_labels)
 
 
 def warm_start_active_learner(
@@ -83,51 +117,139 @@ def create_active_learner(
     training_indices: np.ndarray = None,
     model: str = TransformerModels.BERT_TINY.value,
     device: str = "",
+    incremental_epochs: int = None,
+    replay_size: int = None,
+    full_retrain_every: int = None,
+    seed: int = None,
+    warm_start: bool = True,
+    profiler: PhaseProfiler = None,
+    dynamic_padding: bool = True,
+    scoring_backend: str | None = None,
 ) -> set[PoolBasedActiveLearner, int]:
     """Load transformer, build clf_factory based on it and return a PoolBasedActiveLearner.
 
     Args:
         train_set (TransformersDataset): A training set
         num_classes (int): Number of labels
+        incremental_epochs (int, optional): Continue fine-tuning the previous model
+            for this many epochs on every update. None retrains from scratch.
+        replay_size (int, optional): Previously labeled samples replayed in an
+            incremental update, None replays all of them.
+        full_retrain_every (int, optional): Retrain from scratch on every n-th
+            update in incremental mode.
+        seed (int, optional): Seed for drawing the replayed samples.
+        warm_start (bool, optional): Label and train on the initial samples. Turned
+            off when the state is restored from a checkpoint. Defaults to True.
+        profiler (PhaseProfiler, optional): Measures the warm start as training.
+        dynamic_padding (bool, optional): Predict in length buckets, which are only
+            padded to their longest text. Defaults to True.
+        scoring_backend (str, optional): One of SCORING_BACKENDS, e.g. "int8", whose
+            copy of the classifier scores queries and stopping criteria. None
+            uses the classifier itself.
 
     Returns:
-        set[PoolBasedActiveLearner, int]: The active learner and the indices of pre_labeled data after warm start
+        set[PoolBasedActiveLearner, int]: The active learner and the indices of pre_labeled data after warm start, None without warm start
     """
     # Code for SetFit
     # sentence_transformer_model_name = "sentence-transformers/paraphrase-mpnet-base-v2"
     # setfit_model_args = SetFitModelArguments(sentence_transformer_model_name)
     # clf_factory = SetFitClassificationFactory(setfit_model_args, num_classes)
     # Code for Transformer
-    import psutil
-
-    process = psutil.Process()
-    print(f"Memory before transformer model: {process.memory_info().rss}")
     transformer_model = TransformerModelArguments(model)
     #   kwargs = {"mini_batch_size": 32, "class_weight": None} -> This would have been the paper implementation.
     kwargs = {"mini_batch_size": 32, "class_weight": "balanced"}
     if device:
         kwargs["device"] = device
-    print(f"Memory before classification factory: {process.memory_info().rss}")
-    clf_factory = TransformerBasedClassificationFactory(
+    # The factory takes the pretrained weights from the process-wide registry, so
+    # they are read from disk once and not for every new classifier.
+    clf_factory = RegistryTransformerBasedClassificationFactory(
         transformer_model, num_classes, kwargs=kwargs
     )
-    print(f"Memory before active learner: {process.memory_info().rss}")
-    active_learner = PoolBasedActiveLearner(clf_factory, query_strategy, train_set)
-    indices_labeled = warm_start_active_learner(
-        active_learner, train_set.y, training_indices
-    )
-    print(f"Memory after active learner: {process.memory_info().rss}")
+    # The cached learner lets query, evaluation and stopping criteria share
+    # one prediction over the pool per iteration.
+    prediction_cache = PredictionCache(dynamic_padding=dynamic_padding)
+    if incremental_epochs is None:
+        active_learner = CachedPoolBasedActiveLearner(
+            clf_factory,
+            query_strategy,
+            train_set,
+            prediction_cache=prediction_cache,
+            scoring_backend=scoring_backend,
+        )
+    else:
+        active_learner = IncrementalPoolBasedActiveLearner(
+            clf_factory,
+            query_strategy,
+            train_set,
+            incremental_epochs=incremental_epochs,
+            replay_size=replay_size,
+            full_retrain_every=full_retrain_every,
+            seed=seed,
+            prediction_cache=prediction_cache,
+            scoring_backend=scoring_backend,
+        )
+    indices_labeled = None
+    if warm_start:
+        with profiler.phase("training") if profiler else nullcontext():
+            indices_labeled = warm_start_active_learner(
+                active_learner, train_set.y, training_indices
+            )
 
     return active_learner, indices_labeled
 
 
+def per_class_accuracy(y_true, y_pred, labels) -> list[float]:
+    """Accuracy on the samples of every class, i.e. the recall per class."""
+    return recall_score(
+        y_true, y_pred, labels=labels, average=None, zero_division=0
+    ).tolist()
+
+
+# Every metric is computed from the same predictions, adding one does not
+# need another forward pass.
+EVALUATION_METRICS = {
+    "accuracy": lambda y_true, y_pred, labels: accuracy_score(y_true, y_pred),
+    "macro_f1": lambda y_true, y_pred, labels: f1_score(
+        y_true, y_pred, labels=labels, average="macro", zero_division=0
+    ),
+    "per_class_accuracy": per_class_accuracy,
+}
+
+
+def evaluate_metrics(
+    active_learner, train, test, metrics: list[str] = list(EVALUATION_METRICS)
+) -> dict[str, float]:
+    """Evaluate the classifier with one prediction per set.
+
+    Args:
+        active_learner (PoolBasedActiveLearner): The active learner.
+        train (TransformersDataset | IndexedDatasetView): The labeled set, a
+            view reuses cached predictions over the training pool.
+        test (TransformersDataset): The test set.
+        metrics (list[str], optional): Names of metrics in EVALUATION_METRICS.
+            Defaults to all of them.
+
+    Returns:
+        dict[str, float]: The metrics by name, prefixed with train_ and test_.
+    """
+    predictions = {
+        "train": (train.y, active_learner.classifier.predict(train)),
+        "test": (test.y, active_learner.classifier.predict(test)),
+    }
+    labels = np.union1d(train.y, test.y)
+    return {
+        f"{set_name}_{metric}": EVALUATION_METRICS[metric](y_true, y_pred, labels)
+        for set_name, (y_true, y_pred) in predictions.items()
+        for metric in metrics
+    }
+
+
 def evaluate(active_learner, train, test) -> set[float, float]:
-    y_pred = active_learner.classifier.predict(train)
-    y_pred_test = active_learner.classifier.predict(test)
+    results = evaluate_metrics(active_learner, train, test, metrics=["accuracy"])
 
     # Notice: We observe the train accuracy now.
-    train_acc = accuracy_score(y_pred, train.y)
-    test_acc = accuracy_score(y_pred_test, test.y)
+    train_acc = results["train_accuracy"]
+    test_acc = results["test_accuracy"]
 
     print("Train accuracy: {:.2f}".format(train_acc))
     print("Test accuracy: {:.2f}".format(test_acc))
@@ -144,17 +266,17 @@ def fill_query_with_augmented_search_room(
     y: np.ndarray,
     n: int,
 ) -> set[np.ndarray, np.ndarray]:
-    # Firstly we need three lists to keep track of the indices
-    # that we do not want to query again in while loop.
-    original_indices_queried = np.array([], dtype=int)
-    augmented_indices_queried = np.array([], dtype=int)
-    already_queried = np.array([], dtype=int)
-    while len(original_indices_queried) < n:
+    # Firstly we need to keep track of the indices that we do not want to
+    # query again in while loop. The pool state holds them as boolean masks.
+    pool = PoolState(len(dataset), indices_unlabeled, indices_labeled)
+    originals_chosen = np.zeros(len(pool), dtype=bool)
+    num_chosen = 0
+    while num_chosen < n:
         # Two steps:
         # 1. Query the base_strategy indices_unlabeled should
         # be trimmed of indices that we either queried already in the
         # while loop or that we queried in the past.
-        # 2. Add the indices that we queried to the already_queried list
+        # 2. Mark the indices that we queried in the pool state,
         # get original indices, if we get augemented ones in base and
         # at the end get all augmented from the base ones. This
         # ensures that we can "trow away" the augmented ones after
@@ -162,48 +284,22 @@ def fill_query_with_augmented_search_room(
         query = query_strategy.base_strategy.query(
             clf,
             dataset,
-            np.setdiff1d(
-                np.setdiff1d(
-                    np.setdiff1d(indices_unlabeled, already_queried),
-                    augmented_indices_queried,
-                ),
-                original_indices_queried,
-            ),
+            pool.candidates(),
             indices_labeled,
             y,
-            n - len(original_indices_queried),
+            n - num_chosen,
         )
+        pool.mark_queried(query)
 
-        already_queried = np.unique(np.concatenate((already_queried, query)))
-        original_indices_queried = np.unique(
-            np.concatenate(
-                (
-                    original_indices_queried,
-                    [
-                        (
-                            int(query_strategy.get_origin_augmented_index(elem))
-                            if elem in query_strategy.flattened_augmented_values
-                            else int(elem)
-                        )
-                        for elem in query
-                    ],
-                ),
-            )
-        )
-        augmented_indices_queried = np.unique(
-            np.concatenate(
-                (
-                    augmented_indices_queried,
-                    [
-                        int(x)
-                        for xs in [
-                            query_strategy.augmented_indices[x]
-                            for x in original_indices_queried
-                        ]
-                        for x in xs
-                    ],
-                ),
-            )
-        )
+        origins = query_strategy.get_origin_indices(query)
+        origins = np.unique(origins[~originals_chosen[origins]])
+        originals_chosen[origins] = True
+        num_chosen += len(origins)
+        pool.exclude(origins)
+        pool.exclude(query_strategy.augmented_groups.expand(origins))
+    original_indices_queried = np.flatnonzero(originals_chosen)
+    augmented_indices_queried = np.sort(
+        query_strategy.augmented_groups.expand(original_indices_queried)
+    )
     original_indices_queried = original_indices_queried[:n]
     return original_indices_queried, augmented_indices_queried
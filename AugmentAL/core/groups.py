@@ -0,0 +1,319 @@
+import json
+import os
+from collections.abc import Mapping
+
+import numpy as np
+
+ORIGINALS_FILE = "augmented_groups_originals.npy"
+OFFSETS_FILE = "augmented_groups_offsets.npy"
+MEMBERS_FILE = "augmented_groups_members.npy"
+LEGACY_JSON_FILE = "augmented_indices.json"
+REDUCERS = ("mean", "median", "min", "max", "variance")
+
+
+class AugmentationGroups(Mapping):
+    """Compact representation of augmented_indices in CSR layout.
+
+    The augmented samples of the original at position p in originals are stored
+    in members[offsets[p]:offsets[p + 1]]. The class behaves like the former
+    dict[int, list[int]], but keeps everything in a few flat integer arrays.
+    """
+
+    def __init__(
+        self, originals: np.ndarray, offsets: np.ndarray, members: np.ndarray
+    ) -> None:
+        """
+        Args:
+            originals (np.ndarray): Indices of the original samples, one per group.
+            offsets (np.ndarray): Start of every group in members, has
+                len(originals) + 1 entries.
+            members (np.ndarray): Indices of the augmented samples of all groups.
+        """
+        self.originals = np.asarray(originals, dtype=np.int64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.members = np.asarray(members, dtype=np.int64)
+        if len(self.offsets) != len(self.originals) + 1:
+            raise ValueError("offsets needs one entry more than originals.")
+
+        self.num_rows = 1 + int(
+            max(self.originals.max(initial=-1), self.members.max(initial=-1))
+        )
+        # Position of every original inside of originals, -1 for all other rows.
+        self._positions = np.full(self.num_rows, -1, dtype=np.int64)
+        self._positions[self.originals] = np.arange(len(self.originals))
+        # origin_indices[i] is the original row i is based on, originals map
+        # onto themselves.
+        self.origin_indices = np.arange(self.num_rows)
+        self.origin_indices[self.members] = np.repeat(
+            self.originals, np.diff(self.offsets)
+        )
+        # Segments of every original followed by its members, used by reduce.
+        self._segment_offsets = self.offsets + np.arange(len(self.offsets))
+        self._segment_rows = np.empty(self._segment_offsets[-1], dtype=np.int64)
+        is_original = np.zeros(len(self._segment_rows), dtype=bool)
+        is_original[self._segment_offsets[:-1]] = True
+        self._segment_rows[is_original] = self.originals
+        self._segment_rows[~is_original] = self.members
+
+    @classmethod
+    def from_dict(cls, augmented_indices: dict[int, list[int]]) -> "AugmentationGroups":
+        num_groups = len(augmented_indices)
+        originals = np.fromiter(
+            augmented_indices.keys(), dtype=np.int64, count=num_groups
+        )
+        counts = np.fromiter(
+            (len(v) for v in augmented_indices.values()),
+            dtype=np.int64,
+            count=num_groups,
+        )
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+        members = np.fromiter(
+            (x for v in augmented_indices.values() for x in v),
+            dtype=np.int64,
+            count=int(offsets[-1]),
+        )
+        return cls(originals, offsets, members)
+
+    @classmethod
+    def create(
+        cls, augmented_indices: "dict[int, list[int]] | AugmentationGroups"
+    ) -> "AugmentationGroups":
+        """Return augmented_indices as AugmentationGroups, converting dicts."""
+        if isinstance(augmented_indices, cls):
+            return augmented_indices
+        return cls.from_dict(augmented_indices)
+
+    @classmethod
+    def from_repeated_blocks(cls, num_rows: int, n: int) -> "AugmentationGroups":
+        """Groups of a dataset that was concatenated with n augmented copies of
+        itself, as done in create_augmented_dataset.
+        """
+        originals = np.arange(num_rows, dtype=np.int64)
+        offsets = np.arange(num_rows + 1, dtype=np.int64) * n
+        members = (
+            originals[:, None] + num_rows * np.arange(1, n + 1, dtype=np.int64)
+        ).ravel()
+        return cls(originals, offsets, members)
+
+    def __getitem__(self, original: int) -> np.ndarray:
+        position = self._position(original)
+        if position < 0:
+            raise KeyError(original)
+        return self.members[self.offsets[position] : self.offsets[position + 1]]
+
+    def __iter__(self):
+        return iter(self.originals.tolist())
+
+    def __len__(self) -> int:
+        return len(self.originals)
+
+    def __contains__(self, original) -> bool:
+        try:
+            return self._position(original) >= 0
+        except (TypeError, ValueError):
+            return False
+
+    def _position(self, original: int) -> int:
+        original = int(original)
+        if original < 0 or original >= self.num_rows:
+            return -1
+        return int(self._positions[original])
+
+    def group_of(self, indices) -> np.ndarray:
+        """Map every index onto the index of its original sample.
+
+        Args:
+            indices (array-like): Indices of original or augmented rows.
+
+        Returns:
+            np.ndarray: The original index for every given index. Indices unknown
+                to the groups are treated as originals.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        origins = indices.copy()
+        known = indices < self.num_rows
+        origins[known] = self.origin_indices[indices[known]]
+        return origins
+
+    def expand(self, originals) -> np.ndarray:
+        """Get the augmented samples of many originals at once.
+
+        Args:
+            originals (array-like): Indices of original samples. Indices without a
+                group are ignored.
+
+        Returns:
+            np.ndarray: The concatenated members of all given groups.
+        """
+        originals = np.asarray(originals, dtype=np.int64)
+        originals = originals[(originals >= 0) & (originals < self.num_rows)]
+        positions = self._positions[originals]
+        positions = positions[positions >= 0]
+        starts = self.offsets[positions]
+        lengths = self.offsets[positions + 1] - starts
+        # Every member index is its group start plus its rank within the group.
+        shifts = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return self.members[shifts + np.arange(int(lengths.sum()))]
+
+    def reduce(self, values: np.ndarray, reducer: str = "mean") -> np.ndarray:
+        """Reduce per row values over every group, including the original itself.
+
+        Args:
+            values (np.ndarray): One value per row of the dataset. Rows of a 2-d
+                array, e.g. embeddings, are reduced column wise, which is
+                supported by all reducers except median.
+            reducer (str, optional): One of REDUCERS. Defaults to "mean".
+
+        Returns:
+            np.ndarray: One reduced value per group, in the order of originals.
+        """
+        if reducer not in REDUCERS:
+            raise ValueError(f"Unknown reducer {reducer}, choose one of {REDUCERS}.")
+        values = np.asarray(values)
+        if values.ndim > 1 and reducer == "median":
+            raise ValueError("The median reducer only supports 1-d values.")
+        if len(self.originals) == 0:
+            return np.zeros((0,) + values.shape[1:], dtype=float)
+
+        segment_values = values[self._segment_rows]
+        starts = self._segment_offsets[:-1]
+        # Shaped to broadcast against the rows of 2-d values.
+        lengths = np.diff(self._segment_offsets).reshape(
+            (-1,) + (1,) * (values.ndim - 1)
+        )
+        if reducer == "min":
+            return np.minimum.reduceat(segment_values, starts)
+        if reducer == "max":
+            return np.maximum.reduceat(segment_values, starts)
+
+        segment_values = segment_values.astype(float)
+        means = np.add.reduceat(segment_values, starts) / lengths
+        if reducer == "mean":
+            return means
+        if reducer == "variance":
+            deviations = segment_values - np.repeat(means, lengths.ravel(), axis=0)
+            return np.add.reduceat(deviations**2, starts) / lengths
+
+        # Median: sort the values within every segment and average the middle ones.
+        lengths = lengths.ravel()
+        segment_ids = np.repeat(np.arange(len(starts)), lengths)
+        sorted_values = segment_values[np.lexsort((segment_values, segment_ids))]
+        lower = sorted_values[starts + (lengths - 1) // 2]
+        upper = sorted_values[starts + lengths // 2]
+        return (lower + upper) / 2
+
+    def duplicate_members(self, row_keys: np.ndarray) -> np.ndarray:
+        """Find members, which duplicate their original or an earlier member.
+
+        Args:
+            row_keys (np.ndarray): One key per row of the dataset, e.g. a hash of
+                its text. Rows with equal keys are duplicates.
+
+        Returns:
+            np.ndarray: Sorted indices of the duplicate members.
+        """
+        row_keys = np.asarray(row_keys)
+        segment_ids = np.repeat(
+            np.arange(len(self.originals)), np.diff(self._segment_offsets)
+        )
+        # np.unique returns the first occurrence of every (group, key) pair, the
+        # original comes first in its segment and is always kept.
+        _, key_ids = np.unique(row_keys[self._segment_rows], return_inverse=True)
+        pairs = np.stack([segment_ids, key_ids.ravel()], axis=1)
+        _, first = np.unique(pairs, axis=0, return_index=True)
+        is_duplicate = np.ones(len(self._segment_rows), dtype=bool)
+        is_duplicate[first] = False
+        return np.sort(self._segment_rows[is_duplicate])
+
+    def subset(self, rows) -> "AugmentationGroups":
+        """The groups of the dataset reduced to the given rows.
+
+        Rows are renumbered by their position in rows, e.g. for dataset.select(rows).
+        Members, which are not part of rows, are dropped from their group.
+
+        Args:
+            rows (array-like): Sorted indices of the remaining rows, which have to
+                include all originals.
+
+        Returns:
+            AugmentationGroups: The groups in the numbering of the remaining rows.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        new_index = np.full(max(self.num_rows, rows.max(initial=-1) + 1), -1)
+        new_index[rows] = np.arange(len(rows))
+        originals = new_index[self.originals]
+        if (originals < 0).any():
+            raise ValueError("The remaining rows have to include all originals.")
+        members = new_index[self.members]
+        kept = members >= 0
+        group_ids = np.repeat(np.arange(len(self.originals)), np.diff(self.offsets))
+        counts = np.bincount(group_ids[kept], minlength=len(self.originals))
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+        return AugmentationGroups(originals, offsets, members[kept])
+
+    def to_dict(self) -> dict[int, list[int]]:
+        return {
+            int(original): self.members[start:end].tolist()
+            for original, start, end in zip(
+                self.originals, self.offsets[:-1], self.offsets[1:]
+            )
+        }
+
+    def save(self, path: str) -> None:
+        """Save the groups as .npy files into the directory at path."""
+        np.save(os.path.join(path, ORIGINALS_FILE), self.originals)
+        np.save(os.path.join(path, OFFSETS_FILE), self.offsets)
+        np.save(os.path.join(path, MEMBERS_FILE), self.members)
+
+    @classmethod
+    def load(cls, path: str) -> "AugmentationGroups":
+        """Load groups saved with save, or a legacy augmented_indices.json."""
+        if not os.path.exists(os.path.join(path, OFFSETS_FILE)):
+            with open(os.path.join(path, LEGACY_JSON_FILE), "r") as f:
+                return cls.from_dict({int(k): v for k, v in json.load(f).items()})
+        return cls(
+            np.load(os.path.join(path, ORIGINALS_FILE)),
+            np.load(os.path.join(path, OFFSETS_FILE)),
+            np.load(os.path.join(path, MEMBERS_FILE)),
+        )
+
+
+def draw_stratified(
+    rng: np.random.Generator, items: np.ndarray, size: int, strata=None
+) -> np.ndarray:
+    """Draw size items without replacement, proportionally to their strata.
+
+    Every stratum gets at least one item, so rare strata are never left out.
+    Items missing to size after rounding are drawn uniformly from the rest.
+
+    Args:
+        rng (np.random.Generator): The random generator.
+        items (np.ndarray): The items to draw from.
+        size (int): Number of items to draw, at most len(items).
+        strata (np.ndarray | None, optional): One stratum per item, e.g. a
+            predicted class. None draws uniformly. Defaults to None.
+
+    Returns:
+        np.ndarray: The sorted drawn items.
+    """
+    items = np.asarray(items)
+    size = min(size, len(items))
+    if strata is None:
+        return np.sort(rng.choice(items, size, replace=False))
+
+    strata = np.asarray(strata)
+    classes, class_counts = np.unique(strata, return_counts=True)
+    allocation = np.maximum(1, np.round(class_counts / len(items) * size)).astype(int)
+    allocation = np.minimum(allocation, class_counts)
+    drawn = np.concatenate(
+        [
+            rng.choice(items[strata == c], k, replace=False)
+            for c, k in zip(classes, allocation)
+        ]
+    )
+    if len(drawn) < size:
+        rest = np.setdiff1d(items, drawn)
+        drawn = np.concatenate(
+            (drawn, rng.choice(rest, size - len(drawn), replace=False))
+        )
+    return np.sort(drawn)
@@ -0,0 +1,110 @@
+import numpy as np
+from core.cache import CachedPoolBasedActiveLearner, CachingClassifier
+
+
+class IncrementalPoolBasedActiveLearner(CachedPoolBasedActiveLearner):
+    """CachedPoolBasedActiveLearner, which continues fine-tuning the model of the
+    previous iteration instead of training a new one from scratch on every update.
+
+    An incremental update trains for incremental_epochs on the newly labeled
+    samples plus a replayed sample of the previously labeled ones. Every
+    full_retrain_every retrains the model is trained from scratch on the whole
+    labeled set again, which limits the drift of the continued fine-tuning.
+    """
+
+    checkpoint_attributes = CachedPoolBasedActiveLearner.checkpoint_attributes + (
+        "num_retrains",
+        "full_retrain_history",
+        "_indices_trained",
+        "_rng",
+    )
+
+    def __init__(
+        self,
+        *args,
+        incremental_epochs: int = 2,
+        replay_size: int | None = None,
+        full_retrain_every: int | None = None,
+        seed: int | None = None,
+        **kwargs,
+    ):
+        """
+        Args:
+            incremental_epochs (int, optional): Epochs of an incremental update.
+                Defaults to 2.
+            replay_size (int | None, optional): Number of previously labeled samples
+                replayed in an incremental update, None replays all of them.
+            full_retrain_every (int | None, optional): Train from scratch on every
+                n-th retrain, n >= 1, the initial one counts as the 0th. None only
+                trains the initial model from scratch.
+            seed (int | None, optional): Seed for drawing the replayed samples.
+        """
+        if full_retrain_every is not None and full_retrain_every < 1:
+            raise ValueError("full_retrain_every must be at least 1 or None.")
+        kwargs["reuse_model"] = True
+        super().__init__(*args, **kwargs)
+        self.incremental_epochs = incremental_epochs
+        self.replay_size = replay_size
+        self.full_retrain_every = full_retrain_every
+        self.num_retrains = 0
+        # True for every retrain, which started from scratch.
+        self.full_retrain_history = []
+        self._indices_trained = np.empty(0, dtype=int)
+        self._rng = np.random.default_rng(seed)
+
+    def _is_full_retrain(self, indices_validation) -> bool:
+        if self._clf is None or len(self._indices_trained) == 0:
+            return True
+        # Custom validation sets refer to the whole labeled set.
+        if indices_validation is not None:
+            return True
+        return (
+            self.full_retrain_every is not None
+            and self.num_retrains % self.full_retrain_every == 0
+        )
+
+    def _training_positions(self) -> np.ndarray:
+        """Positions within indices_labeled, which an incremental update trains on."""
+        seen = np.isin(self.indices_labeled, self._indices_trained)
+        new_positions = np.flatnonzero(~seen)
+        replay_positions = np.flatnonzero(seen)
+        if self.replay_size is not None and self.replay_size < len(replay_positions):
+            replay_positions = self._rng.choice(
+                replay_positions, self.replay_size, replace=False
+            )
+        return np.sort(np.concatenate([new_positions, replay_positions]))
+
+    def _retrain(self, indices_validation=None):
+        self.invalidate_predictions()
+        if isinstance(self._clf, CachingClassifier):
+            self._clf = self._clf.classifier
+
+        full_retrain = self._is_full_retrain(indices_validation)
+        if full_retrain:
+            self._clf = None
+            self._clf = self._clf_factory.new()
+            positions = np.arange(len(self.indices_labeled))
+        else:
+            positions = self._training_positions()
+
+        dataset = self.dataset[self.indices_labeled[positions]].clone()
+        dataset.y = self.y[positions]
+
+        if full_retrain:
+            if indices_validation is None:
+                self._clf.fit(dataset, **self.fit_kwargs)
+            else:
+                mask = np.isin(positions, indices_validation)
+                self._clf.fit(dataset[~mask], validation_set=dataset[mask])
+        else:
+            num_epochs = self._clf.num_epochs
+            self._clf.num_epochs = self.incremental_epochs
+            try:
+                self._clf.fit(dataset, **self.fit_kwargs)
+            finally:
+                self._clf.num_epochs = num_epochs
+
+        self._indices_trained = self.indices_labeled.copy()
+        self.full_retrain_history.append(full_retrain)
+        self.num_retrains += 1
+        self._clf = CachingClassifier(self._clf, self.prediction_cache)
@@ -1,32 +1,119 @@
-from datetime import datetime
 import numpy as np
+import random
+import torch
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from core.checkpoint import RunCheckpoint, WarmStartSnapshot, get_run_random_states
 from core.core import (
     create_active_learner,
     create_small_text_dataset,
-    evaluate,
+    evaluate_metrics,
+    EVALUATION_METRICS,
 )
 from core.constants import TransformerModels
+from core.groups import AugmentationGroups
+from core.views import IndexedDatasetView
+from core.profiling import PhaseProfiler
+from core.results import JsonlResultsSink
 from core.query_strategies import (
+    AugmentedKCenterQueryStrategy,
     AugmentedOutcomesQueryStrategy,
     AugmentedSearchSpaceExtensionAndOutcomeQueryStrategy,
     AugmentedSearchSpaceExtensionQueryStrategy,
     AverageAcrossAugmentedQueryStrategy,
+    SubsampledQueryStrategy,
+)
+from core.stopping import (
+    DEFAULT_STOPPING_CRITERIA,
+    StoppingCriteria,
+    select_stopping_indices,
 )
 from small_text import (
     BreakingTies,
     QueryStrategy,
-    KappaAverage,
     RandomSampling,
     OverallUncertainty,
-    DeltaFScore,
-    ClassificationChange,
 )
 
 # CONSTANTS
 SEED = 2022
 np.random.seed(SEED)
 
+QUERY_STATS_KEYS = ["pool_size", "rounds", "inference_seconds", "mapping_seconds"]
+# Profiled phases, every result row has their columns, None if a phase did not run.
+PROFILE_PHASES = ["tokenization", "training", "query", "stopping", "evaluation"]
+# Evaluation metrics, which are reported under another column in the results.
+RESULT_COLUMNS = {
+    "test_accuracy": "test_accuracies",
+    "train_accuracy": "train_accuracies",
+}
+
+
+def get_query_stats(query_strategy: QueryStrategy) -> dict | None:
+    """Stats of the last query of the first strategy in the chain of base
+    strategies, which records them. None if no strategy records stats.
+    """
+    strategy = query_strategy
+    while not hasattr(strategy, "query_stats") and hasattr(strategy, "base_strategy"):
+        strategy = strategy.base_strategy
+    return getattr(strategy, "last_query_stats", None)
+
+
+def seed_everything(seed: int) -> None:
+    """Seed python, numpy and torch, so that a run does not depend on anything
+    that ran before in this process.
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+
+
+def create_warm_start(
+    raw_test,
+    raw_train,
+    augmented_indices,
+    model: str = TransformerModels.BERT_TINY.value,
+    device: str = "",
+    incremental_epochs: int | None = None,
+    replay_size: int | None = None,
+    full_retrain_every: int | None = None,
+    seed: int | None = None,
+    dynamic_padding: bool = True,
+) -> WarmStartSnapshot:
+    """Tokenize the datasets and warm start the classifier once for several runs.
+
+    The snapshot is handed to run_active_learning_loop as warm_start_snapshot,
+    together with the same seed and learner configuration. Every run then starts
+    from the same initial model, as if it had trained it itself.
+
+    Returns:
+        WarmStartSnapshot: The tokenized datasets and the warm-started learner.
+    """
+    if seed is None:
+        seed = SEED
+    else:
+        seed_everything(seed)
+    num_classes = raw_train.features["label"].num_classes
+    augmented_indices = AugmentationGroups.create(augmented_indices)
+    test = create_small_text_dataset(raw_test)
+    train = create_small_text_dataset(raw_train)
+    active_learner, indices_labeled = create_active_learner(
+        train_set=train,
+        num_classes=num_classes,
+        training_indices=augmented_indices.originals if augmented_indices else None,
+        # The warm start does not query, any strategy will do.
+        query_strategy=RandomSampling(),
+        model=model,
+        device=device,
+        incremental_epochs=incremental_epochs,
+        replay_size=replay_size,
+        full_retrain_every=full_retrain_every,
+        seed=seed,
+        dynamic_padding=dynamic_padding,
+    )
+    return WarmStartSnapshot(train, test, active_learner, indices_labeled)
+
 
 def run_active_learning_loop(
     raw_test,
@@ -40,42 +127,42 @@ def run_active_learning_loop(
     base_strategy: QueryStrategy = BreakingTies(),
     model: str = TransformerModels.BERT_TINY.value,
     device: str = "",
+    single_pass: bool = False,
+    group_reducer: str = "mean",
+    subsample_size: int | None = None,
+    stratified_subsample: bool = False,
+    stopping_criteria_config: dict[
+        str, dict[str, float | None]
+    ] = DEFAULT_STOPPING_CRITERIA,
+    stopping_set: str | int = "all",
+    evaluation_metrics: list[str] = list(EVALUATION_METRICS),
+    incremental_epochs: int | None = None,
+    replay_size: int | None = None,
+    full_retrain_every: int | None = None,
+    run_dir: str | Path | None = None,
+    seed: int | None = None,
+    warm_start_snapshot: WarmStartSnapshot | None = None,
+    results_sink: JsonlResultsSink | None = None,
+    pipelined: bool = False,
+    scoring_backend: str | None = None,
+    dynamic_padding: bool = True,
 ) -> (dict, str):
+    if seed is None:
+        seed = SEED
+    else:
+        seed_everything(seed)
     num_classes = raw_train.features["label"].num_classes
+    # All strategies share one CSR representation of the augmentation groups.
+    augmented_indices = AugmentationGroups.create(augmented_indices)
     # Define different stopping criteria, 4 ones are given by small-text
-    # Every criterion will be configured in three variants
+    # Every criterion will be configured in variants, by default three:
     # Conservative, which will be the default one
     # Middle ground, which will be a bit more aggressive
     # Aggressive, which will be the most aggressive one
 
-    import psutil
-
-    process = psutil.Process()
-    print(f"Memory before kappa: {process.memory_info().rss}")
-    print("initializing stopping criteria")
-    # Kappa Average
-    kappa_average_conservative = KappaAverage(num_classes)
-    kappa_average_middle_ground = KappaAverage(num_classes, kappa=0.9)
-    kappa_average_aggressive = KappaAverage(num_classes, kappa=0.8)
-    print(f"Memory after kappa: {process.memory_info().rss}")
-    # Delta F-Score
-    # print(f"Memory before delta f: {process.memory_info().rss}")
-    if num_classes is 2:
-        delta_f_score_conservative = DeltaFScore(num_classes)
-        delta_f_score_middle_ground = DeltaFScore(num_classes, threshold=0.07)
-        delta_f_score_aggressive = DeltaFScore(num_classes, threshold=0.09)
-    else:
-        delta_f_score_conservative = None
-        delta_f_score_middle_ground = None
-        delta_f_score_aggressive = None
-    print(f"Memory after delta f: {process.memory_info().rss}")
-    # Classification Change
-    classification_change_conservative = ClassificationChange(num_classes)
-    classification_change_middle_ground = ClassificationChange(
-        num_classes, threshold=0.04
-    )
-    classification_change_aggressive = ClassificationChange(num_classes, threshold=0.09)
-    print(f"Memory after classfication change: {process.memory_info().rss}")
+    # Wall time, CPU time and memory of every phase, exported with the results.
+    profiler = PhaseProfiler(phases=PROFILE_PHASES)
+    stopping_criteria = StoppingCriteria(num_classes, stopping_criteria_config)
 
     # # Overall Uncertainty
     # overall_uncertainty_conservative = OverallUncertainty(num_classes)
@@ -83,8 +170,23 @@ def run_active_learning_loop(
     # overall_uncertainty_aggressive = OverallUncertainty(num_classes, threshold=0.09)
 
     def create_query_strategy(strategy):
+        chosen = create_full_pool_query_strategy(strategy)
+        if subsample_size is None or strategy == "RandomSampling":
+            return chosen
+        # Only score a random part of the pool, keeping augmentation groups whole.
+        return SubsampledQueryStrategy(
+            chosen,
+            subsample_size,
+            augmented_indices=augmented_indices,
+            stratified=stratified_subsample,
+            seed=seed,
+        )
+
+    def create_full_pool_query_strategy(strategy):
         average_across_augmented_strategy = AverageAcrossAugmentedQueryStrategy(
-            base_strategy=base_strategy, augmented_indices=augmented_indices
+            base_strategy=base_strategy,
+            augmented_indices=augmented_indices,
+            reducer=group_reducer,
         )
         if strategy == "RandomSampling":
             return RandomSampling()
@@ -92,11 +194,15 @@ def run_active_learning_loop(
             return base_strategy
         if strategy == "AugmentedSearchSpaceExtensionQueryStrategy":
             return AugmentedSearchSpaceExtensionQueryStrategy(
-                base_strategy=base_strategy, augmented_indices=augmented_indices
+                base_strategy=base_strategy,
+                augmented_indices=augmented_indices,
+                single_pass=single_pass,
             )
         if strategy == "AugmentedSearchSpaceExtensionAndOutcomeQueryStrategy":
             return AugmentedSearchSpaceExtensionAndOutcomeQueryStrategy(
-                base_strategy=base_strategy, augmented_indices=augmented_indices
+                base_strategy=base_strategy,
+                augmented_indices=augmented_indices,
+                single_pass=single_pass,
             )
         if strategy == "AugmentedOutcomesQueryStrategy":
             return AugmentedOutcomesQueryStrategy(
@@ -104,10 +210,13 @@ def run_active_learning_loop(
             )
         if strategy == "AverageAcrossAugmentedQueryStrategy":
             return average_across_augmented_strategy
+        if strategy == "AugmentedKCenterQueryStrategy":
+            return AugmentedKCenterQueryStrategy(augmented_indices=augmented_indices)
         if strategy == "AverageAcrossAugmentedExtendedOutcomesQueryStrategy":
             return AugmentedSearchSpaceExtensionAndOutcomeQueryStrategy(
                 base_strategy=average_across_augmented_strategy,
                 augmented_indices=augmented_indices,
+                single_pass=single_pass,
             )
 
         # Here we could add more custom configurations for the query strategies
@@ -130,59 +239,175 @@ def run_active_learning_loop(
         #     ),
         # }
 
-    print(
-        f"Memory before creating small text datasets in percent: {process.memory_percent()}"
-    )
-    print(f"Memory before creating small text datasets: {process.memory_info().rss}")
-    test = create_small_text_dataset(raw_test)
-    train = create_small_text_dataset(raw_train)
-    print(
-        f"Memory after creating small text datasets in percent: {process.memory_percent()}"
-    )
-    print(f"Memory after creating small text datasets: {process.memory_info().rss}")
+    if warm_start_snapshot is not None:
+        # Tokenized once for all runs sharing the snapshot.
+        test, train = warm_start_snapshot.test, warm_start_snapshot.train
+    else:
+        with profiler.phase("tokenization"):
+            test = create_small_text_dataset(raw_test)
+            train = create_small_text_dataset(raw_train)
     chosen_strategy = (
         # query_strategies[query_strategy]
         create_query_strategy(query_strategy)
         if isinstance(query_strategy, str)
         else query_strategy
     )
-    print(f"Memory before creating active learner: {process.memory_info().rss}")
+    details_str = f"{query_strategy}_{base_strategy}_{num_queries}_queries_num_samples_{num_samples}_num_augmentations_{num_augmentations}"
+    # With a run directory, every iteration is checkpointed and an interrupted
+    # run continues after its last finished iteration.
+    checkpoint = RunCheckpoint(run_dir, run_key=details_str) if run_dir else None
+    resume = checkpoint is not None and checkpoint.exists()
+    loop_start = perf_counter()
     active_learner, indices_labeled = create_active_learner(
         train_set=train,
         num_classes=num_classes,
-        training_indices=[x for x in augmented_indices.keys()]
-        if augmented_indices
-        else None,
+        training_indices=augmented_indices.originals if augmented_indices else None,
         query_strategy=chosen_strategy,
         model=model,
         device=device,
+        incremental_epochs=incremental_epochs,
+        replay_size=replay_size,
+        full_retrain_every=full_retrain_every,
+        seed=seed,
+        warm_start=not resume and warm_start_snapshot is None,
+        profiler=profiler,
+        scoring_backend=scoring_backend,
+        dynamic_padding=dynamic_padding,
     )
+    if warm_start_snapshot is not None and not resume:
+        indices_labeled = warm_start_snapshot.fork(active_learner)
     print("active learner created")
+    # The stopping criteria only see predictions for the stopping set, which is
+    # fixed for the whole run.
+    stopping_indices = select_stopping_indices(
+        len(train), augmented_indices, stopping_set, seed=seed
+    )
+    stopping_dataset = (
+        train
+        if stopping_indices is None
+        else IndexedDatasetView(train, stopping_indices)
+    )
     indices_train = [x for x in range(raw_train.num_rows)]
-    test_results = []
-    train_results = []
+    elapsed_seconds = []
+    evaluation_history = {
+        f"{set_name}_{metric}": []
+        for set_name in ("train", "test")
+        for metric in evaluation_metrics
+    }
     stopping_history = []
-    samples_count = [len(indices_labeled)]
-    kappa_average_conservative_history = []
-    kappa_average_middle_ground_history = []
-    kappa_average_aggressive_history = []
-
-    delta_f_score_conservative_history = []
-    delta_f_score_middle_ground_history = []
-    delta_f_score_aggressive_history = []
-
-    classification_change_conservative_history = []
-    classification_change_middle_ground_history = []
-    classification_change_aggressive_history = []
 
     overall_uncertainty_conservative_history = []
     overall_uncertainty_middle_ground_history = []
     overall_uncertainty_aggressive_history = []
 
-    train_results.append(evaluate(active_learner, train[indices_labeled], test)[0])
-    test_results.append(evaluate(active_learner, train[indices_labeled], test)[1])
+    query_stats_history = {f"query_{key}": [] for key in QUERY_STATS_KEYS}
+
+    def evaluate_iteration(iteration, indices_labeled):
+        # A view on the labeled rows lets the evaluation reuse the cached pool
+        # predictions, the test set is predicted once for all metrics.
+        labeled_view = IndexedDatasetView(train, indices_labeled)
+        with profiler.phase("evaluation", iteration):
+            results = evaluate_metrics(
+                active_learner, labeled_view, test, metrics=evaluation_metrics
+            )
+        for key, value in results.items():
+            evaluation_history[key].append(value)
+        # Time to completion of every iteration, including the initial training.
+        elapsed_seconds.append(perf_counter() - loop_start)
+        for key in ("train_accuracy", "test_accuracy"):
+            if key in results:
+                print(f"{key.replace('_', ' ').capitalize()}: {results[key]:.2f}")
+
+    def stop_and_evaluate(iteration, indices_labeled):
+        # All criteria share one prediction over the training pool, made by the
+        # same classifier as the one of the query.
+        with profiler.phase("stopping", iteration):
+            stopping_criteria.stop(
+                active_learner.scoring_classifier.predict(stopping_dataset)
+            )
+        # Evaluated after the stopping criteria, whose pool predictions it reuses
+        # unless they come from a scoring backend.
+        evaluate_iteration(iteration, indices_labeled)
+
+    def record_iteration(iteration):
+        # Streams the row of this iteration, the result dict is only returned at
+        # the end of the run. In pipelined mode the next query already ran, so
+        # every history is indexed by the iteration.
+        if results_sink is None:
+            return
+        record = {
+            "iterations": iteration,
+            "elapsed_seconds": elapsed_seconds[iteration],
+        }
+        for key, history in evaluation_history.items():
+            record[RESULT_COLUMNS.get(key, key)] = history[iteration]
+        record.update(profiler.iteration_profile(iteration))
+        if iteration > 0:
+            # Stopping criteria and query stats are only evaluated after a query.
+            for column, history in {
+                **stopping_criteria.history,
+                **query_stats_history,
+            }.items():
+                record[column] = history[iteration - 1]
+        full_retrain_history = getattr(active_learner, "full_retrain_history", [])
+        if iteration < len(full_retrain_history):
+            record["full_retrain"] = full_retrain_history[iteration]
+        results_sink.append(record)
 
-    for i in range(num_queries):
+    def loop_state(iteration):
+        # Leaves out the query of the next iteration, if it already ran.
+        return {
+            "indices_labeled": indices_labeled,
+            "samples_count": samples_count,
+            "elapsed_seconds": elapsed_seconds,
+            "evaluation_history": evaluation_history,
+            "query_stats_history": {
+                key: history[:iteration] for key, history in query_stats_history.items()
+            },
+            "stopping_criteria": stopping_criteria,
+            "profile_records": [
+                record
+                for record in profiler.records
+                if record["iteration"] <= iteration
+            ],
+        }
+
+    def finish_iteration(iteration, random_states=None):
+        record_iteration(iteration)
+        if checkpoint is not None:
+            checkpoint.save(
+                iteration, active_learner, loop_state(iteration), random_states
+            )
+
+    start_iteration = 0
+    if resume:
+        state = checkpoint.restore(active_learner)
+        start_iteration = state["iteration"]
+        indices_labeled = state["loop"]["indices_labeled"]
+        samples_count = state["loop"]["samples_count"]
+        elapsed_seconds.extend(state["loop"]["elapsed_seconds"])
+        evaluation_history.update(state["loop"]["evaluation_history"])
+        query_stats_history.update(state["loop"]["query_stats_history"])
+        stopping_criteria = state["loop"]["stopping_criteria"]
+        profiler.records = state["loop"]["profile_records"]
+        loop_start = perf_counter() - elapsed_seconds[-1]
+    else:
+        samples_count = [len(indices_labeled)]
+        evaluate_iteration(0, indices_labeled)
+        finish_iteration(0)
+
+    # In pipelined mode the stopping criteria and evaluation of an iteration run
+    # in the background during the query of the next one. They are joined before
+    # the next update, so the classifier does not change while they use it.
+    evaluation_executor = ThreadPoolExecutor(max_workers=1) if pipelined else None
+    pending_iteration = None
+
+    def finish_pending_iteration():
+        future, iteration, random_states = pending_iteration
+        future.result()
+        finish_iteration(iteration, random_states)
+
+    for i in range(start_iteration, num_queries):
         # ...where each iteration consists of labelling 20 samples
         # Using the AugmentedExpansionQueryStrategy will result in more than 20
         # samples provided. This has to be handled by usage of
@@ -192,19 +417,30 @@ def run_active_learning_loop(
         # and add the label that is gotten to the virtual samples, which
         # are retrieved by augmented_indices.
         txt_filename = f"{query_strategy}_{base_strategy}_{num_queries}_queries_{num_samples}_num_samples_{num_augmentations}_num_augmentations.txt"
-        indices_queried = active_learner.query(num_samples=num_samples)
+        profiler.iteration = i + 1
+        with profiler.phase("query"):
+            indices_queried = active_learner.query(num_samples=num_samples)
+        query_stats = get_query_stats(chosen_strategy)
+        for key in QUERY_STATS_KEYS:
+            query_stats_history[f"query_{key}"].append(
+                query_stats[key] if query_stats else None
+            )
+        if query_stats:
+            print(f"Query stats: {query_stats}")
+        if pending_iteration is not None:
+            finish_pending_iteration()
+            pending_iteration = None
 
         y = train.y[indices_queried]
 
         # Return the labels for the current query to the active learner.
-        active_learner.update(y)
+        with profiler.phase("training"):
+            active_learner.update(y)
 
         indices_labeled = np.concatenate([indices_queried, indices_labeled])
 
         print("---------------")
         print(f"Iteration #{i} ({len(indices_labeled)} samples)")
-        train_results.append(evaluate(active_learner, train[indices_labeled], test)[0])
-        test_results.append(evaluate(active_learner, train[indices_labeled], test)[1])
 
         # stopping_criterion_response = stopping_criterion.stop(
         #     predictions=active_learner.classifier.predict(train)
@@ -212,63 +448,15 @@ def run_active_learning_loop(
         # print(f"Stop: {stopping_criterion_response}")
         # stopping_history.append(stopping_criterion_response)
 
-        stopping_criteria_start = datetime.now()
-        print(f"Evaluating stopping criteria, starting at {stopping_criteria_start} \n")
-        kappa_average_conservative_history.append(
-            kappa_average_conservative.stop(
-                predictions=active_learner.classifier.predict(train)
-            )
-        )
-        kappa_average_middle_ground_history.append(
-            kappa_average_middle_ground.stop(
-                predictions=active_learner.classifier.predict(train)
-            )
-        )
-        kappa_average_aggressive_history.append(
-            kappa_average_aggressive.stop(
-                predictions=active_learner.classifier.predict(train)
-            )
-        )
-        if delta_f_score_conservative:
-            delta_f_score_conservative_history.append(
-                delta_f_score_conservative.stop(
-                    predictions=active_learner.classifier.predict(train)
-                )
-            )
-        else:
-            delta_f_score_conservative_history.append(False)
-        if delta_f_score_middle_ground:
-            delta_f_score_middle_ground_history.append(
-                delta_f_score_middle_ground.stop(
-                    predictions=active_learner.classifier.predict(train)
-                )
-            )
-        else:
-            delta_f_score_middle_ground_history.append(False)
-        if delta_f_score_aggressive:
-            delta_f_score_aggressive_history.append(
-                delta_f_score_aggressive.stop(
-                    predictions=active_learner.classifier.predict(train)
-                )
+        if pipelined:
+            pending_iteration = (
+                evaluation_executor.submit(stop_and_evaluate, i + 1, indices_labeled),
+                i + 1,
+                # The next query consumes random numbers before the checkpoint.
+                get_run_random_states(active_learner),
             )
         else:
-            delta_f_score_aggressive_history.append(False)
-
-        classification_change_conservative_history.append(
-            classification_change_conservative.stop(
-                predictions=active_learner.classifier.predict(train)
-            )
-        )
-        classification_change_middle_ground_history.append(
-            classification_change_middle_ground.stop(
-                predictions=active_learner.classifier.predict(train)
-            )
-        )
-        classification_change_aggressive_history.append(
-            classification_change_aggressive.stop(
-                predictions=active_learner.classifier.predict(train)
-            )
-        )
+            stop_and_evaluate(i + 1, indices_labeled)
 
         # THIS WONT BE USED ANYMORE I THINK
         # indices_stopping = list(set(indices_train) - set(indices_labeled))
@@ -290,43 +478,53 @@ def run_active_learning_loop(
         #         indices_stopping=indices_stopping
         #     )
         # )
-        stopping_criteria_end = datetime.now()
-        print(f"Finished evaluation stopping criteria at {stopping_criteria_end} \n")
-        print(f"Evaluation took {stopping_criteria_end - stopping_criteria_start} \n")
+        prediction_cache = active_learner.prediction_cache
+        print(
+            f"Prediction cache: {prediction_cache.misses} misses, "
+            f"{prediction_cache.hits} hits \n"
+        )
         # Write indices_queried to a txt file after every third iteration
         if (i + 1) % 3 == 0:
             with open(
                 (Path(__file__).parent / "../results" / txt_filename).resolve(), "a"
             ) as f:
                 f.write(", ".join(map(str, indices_queried)) + "\n")
+        if not pipelined:
+            finish_iteration(i + 1)
 
+    if pending_iteration is not None:
+        finish_pending_iteration()
+    if evaluation_executor is not None:
+        evaluation_executor.shutdown()
+    profiler.close()
     iterations = np.arange(num_queries + 1)
-    test_accuracies = np.array(test_results)
-    train_accuracies = np.array(train_results)
+    evaluation_history = {
+        RESULT_COLUMNS.get(key, key): history
+        for key, history in evaluation_history.items()
+    }
+    test_accuracies = np.array(evaluation_history.pop("test_accuracies", []))
+    train_accuracies = np.array(evaluation_history.pop("train_accuracies", []))
 
     # convert to pandas dataframe
     d = {
         "iterations": iterations,
         "test_accuracies": test_accuracies,
         "train_accuracies": train_accuracies,
-        "kappa_average_conservative_history": kappa_average_conservative_history,
-        "kappa_average_middle_ground_history": kappa_average_middle_ground_history,
-        "kappa_average_aggressive_history": kappa_average_aggressive_history,
-        "delta_f_score_conservative_history": delta_f_score_conservative_history,
-        "delta_f_score_middle_ground_history": delta_f_score_middle_ground_history,
-        "delta_f_score_aggressive_history": delta_f_score_aggressive_history,
-        "classification_change_conservative_history": classification_change_conservative_history,
-        "classification_change_middle_ground_history": classification_change_middle_ground_history,
-        "classification_change_aggressive_history": classification_change_aggressive_history,
+        **evaluation_history,
+        **stopping_criteria.history,
         # "overall_uncertainty_conservative_history": overall_uncertainty_conservative_history,
         # "overall_uncertainty_middle_ground_history": overall_uncertainty_middle_ground_history,
         # "overall_uncertainty_aggressive_history": overall_uncertainty_aggressive_history,
         # "stopping_history": stopping_history,
         "samples_count": samples_count,
+        **query_stats_history,
+        **profiler.iteration_columns(num_queries + 1),
+        "elapsed_seconds": elapsed_seconds,
+        "full_retrain": getattr(
+            active_learner, "full_retrain_history", [True] * (num_queries + 1)
+        ),
     }
 
-    details_str = f"{query_strategy}_{base_strategy}_{num_queries}_queries_num_samples_{num_samples}_num_augmentations_{num_augmentations}"
-
     # with open((Path(__file__).parent / "../results" / saving_name).resolve(), "w") as f:
     # f.write(d_frame.to_json())
 
@@ -0,0 +1,53 @@
+import numpy as np
+
+
+class PoolState:
+    """Bookkeeping of the unlabeled pool during one query, kept in boolean masks.
+
+    Every row of the dataset has a flag for being labeled and for being excluded
+    from further queries (e.g. because its group was already taken), queried rows
+    are no longer available.
+    Updates only touch the given indices and the candidates are produced with a
+    single flatnonzero, so no step has to sort the whole pool.
+    """
+
+    def __init__(self, num_rows: int, indices_unlabeled, indices_labeled) -> None:
+        """
+        Args:
+            num_rows (int): Number of rows of the dataset.
+            indices_unlabeled (array-like): Indices of the rows in the pool.
+            indices_labeled (array-like): Indices of the already labeled rows.
+        """
+        indices_unlabeled = np.asarray(indices_unlabeled, dtype=int)
+        indices_labeled = np.asarray(indices_labeled, dtype=int)
+        num_rows = max(
+            num_rows,
+            indices_unlabeled.max(initial=-1) + 1,
+            indices_labeled.max(initial=-1) + 1,
+        )
+
+        self.labeled = np.zeros(num_rows, dtype=bool)
+        self.labeled[indices_labeled] = True
+        self.excluded = np.zeros(num_rows, dtype=bool)
+        # Rows that may still be handed to a base strategy.
+        self._available = np.zeros(num_rows, dtype=bool)
+        self._available[indices_unlabeled] = True
+        self._available[indices_labeled] = False
+
+    def __len__(self) -> int:
+        return len(self.labeled)
+
+    def mark_queried(self, indices) -> None:
+        self._available[np.asarray(indices, dtype=int)] = False
+
+    def exclude(self, indices) -> None:
+        indices = np.asarray(indices, dtype=int)
+        self.excluded[indices] = True
+        self._available[indices] = False
+
+    def candidates(self) -> np.ndarray:
+        """Indices of all rows that are neither labeled, queried nor excluded."""
+        return np.flatnonzero(self._available)
+
+    def is_labeled(self, indices) -> np.ndarray:
+        return self.labeled[np.asarray(indices, dtype=int)]
@@ -0,0 +1,182 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import psutil
+import torch
+
+PROFILE_METRICS = [
+    "wall_seconds",
+    "cpu_seconds",
+    "peak_rss_bytes",
+    "torch_peak_allocated_bytes",
+]
+
+
+class MemorySampler:
+    """Samples the RSS of the process in a background thread and keeps the peak
+    of every open measurement, so that short spikes within a phase are seen.
+    """
+
+    def __init__(self, interval: float = 0.05) -> None:
+        self.interval = interval
+        self.process = psutil.Process()
+        self._peaks = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self) -> int:
+        rss = self.process.memory_info().rss
+        with self._lock:
+            for token, peak in self._peaks.items():
+                self._peaks[token] = max(peak, rss)
+        return rss
+
+    def start(self, token) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        with self._lock:
+            self._peaks[token] = 0
+        self._sample()
+
+    def stop(self, token) -> int:
+        """End the measurement and return its peak RSS in bytes."""
+        self._sample()
+        with self._lock:
+            return self._peaks.pop(token)
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class PhaseProfiler:
+    """Collects wall time, CPU time, peak RSS and torch allocator stats of the
+    phases of a run, e.g. tokenization, training, query, evaluation and stopping.
+
+    Phases are measured with the phase context manager, which can also decorate
+    functions. Each measurement is recorded for the current iteration, and
+    iteration_columns exports them as one column per phase and metric.
+
+    CPU time and the torch peak are process wide, so they can not be attributed
+    to one of several phases running at once, e.g. in pipelined mode. Both are
+    None for a phase, which overlapped with another one. Its peak RSS is the
+    peak of the process while the phase ran.
+    """
+
+    def __init__(
+        self,
+        sample_interval: float = 0.05,
+        verbose: bool = True,
+        phases: list[str] = [],
+    ) -> None:
+        """
+        Args:
+            sample_interval (float, optional): Seconds between two RSS samples.
+                Defaults to 0.05.
+            verbose (bool, optional): Print every measured phase. Defaults to True.
+            phases (list[str], optional): Phases, whose columns are part of every
+                iteration profile, None where the phase did not run. Defaults to [].
+        """
+        self.phases = list(phases)
+        self.iteration = 0
+        self.records = []
+        self.verbose = verbose
+        self.sampler = MemorySampler(sample_interval)
+        # token -> whether the open phase overlapped with another one.
+        self._open = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str, iteration: int | None = None):
+        """Measure a phase of the current iteration, or of the given one, e.g. for
+        phases running in the background while the next iteration starts.
+        """
+        iteration = self.iteration if iteration is None else iteration
+        token = object()
+        use_cuda = torch.cuda.is_available()
+        with self._lock:
+            overlapped = bool(self._open)
+            for other in self._open:
+                self._open[other] = True
+            self._open[token] = overlapped
+            # Resetting while another phase runs would wipe its peak.
+            if use_cuda and not overlapped:
+                torch.cuda.reset_peak_memory_stats()
+        self.sampler.start(token)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            cpu_seconds = time.process_time() - cpu_start
+            torch_peak = torch.cuda.max_memory_allocated() if use_cuda else None
+            with self._lock:
+                overlapped = self._open.pop(token)
+            record = {
+                "iteration": iteration,
+                "phase": name,
+                "wall_seconds": time.perf_counter() - wall_start,
+                "cpu_seconds": None if overlapped else cpu_seconds,
+                "peak_rss_bytes": self.sampler.stop(token),
+                "torch_peak_allocated_bytes": None if overlapped else torch_peak,
+            }
+            self.records.append(record)
+            if self.verbose:
+                cpu = "overlapped" if overlapped else f"{cpu_seconds:.2f}s"
+                print(
+                    f"{name} (iteration {iteration}): "
+                    f"{record['wall_seconds']:.2f}s wall, {cpu} CPU, "
+                    f"peak RSS {record['peak_rss_bytes'] / 2**20:.0f} MiB"
+                )
+
+    def iteration_profile(self, iteration: int) -> dict:
+        """Measurements of one iteration, as profile_{phase}_{metric}.
+
+        Times of a phase measured several times are summed, peaks are maximized.
+        Phases given on creation, which did not run, are None, and so is a metric
+        missing in any of the measurements of a phase.
+        """
+        profile = {
+            f"profile_{phase}_{metric}": None
+            for phase in self.phases
+            for metric in PROFILE_METRICS
+        }
+        measured = set()
+        for record in self.records:
+            if record["iteration"] != iteration:
+                continue
+            for metric in PROFILE_METRICS:
+                column = f"profile_{record['phase']}_{metric}"
+                value = record[metric]
+                if column not in measured:
+                    measured.add(column)
+                    profile[column] = value
+                elif value is None or profile[column] is None:
+                    profile[column] = None
+                elif metric.endswith("seconds"):
+                    profile[column] += value
+                else:
+                    profile[column] = max(profile[column], value)
+        return profile
+
+    def iteration_columns(self, num_iterations: int) -> dict[str, list]:
+        """One column per phase and metric with a value per iteration, None for
+        iterations in which the phase did not run.
+        """
+        profiles = [self.iteration_profile(i) for i in range(num_iterations)]
+        columns = sorted({column for profile in profiles for column in profile})
+        return {
+            column: [profile.get(column) for profile in profiles] for column in columns
+        }
+
+    def close(self) -> None:
+        self.sampler.close()
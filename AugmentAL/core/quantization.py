@@ -0,0 +1,46 @@
+import copy
+
+import torch
+
+
+def cpu_copy(model: torch.nn.Module) -> torch.nn.Module:
+    """A deep copy of the model, whose parameters and buffers are copied straight
+    to the CPU, so the copy never takes memory on the device of the model.
+    """
+    # deepcopy takes tensors found in the memo as they are, tied weights share
+    # one tensor and stay tied.
+    memo = {}
+    for parameter in model.parameters():
+        memo[id(parameter)] = torch.nn.Parameter(
+            parameter.detach().to("cpu", copy=True),
+            requires_grad=parameter.requires_grad,
+        )
+    for buffer in model.buffers():
+        memo[id(buffer)] = buffer.detach().to("cpu", copy=True)
+    return copy.deepcopy(model, memo)
+
+
+def int8_scoring_copy(classifier):
+    """A copy of the classifier, whose linear layers are dynamically quantized to
+    int8 for inference on the CPU. The classifier itself is not changed.
+
+    Args:
+        classifier (TransformerBasedClassification): A fitted classifier.
+
+    Returns:
+        TransformerBasedClassification: A shallow copy, which only owns its model.
+    """
+    model = cpu_copy(classifier.model).eval()
+    scoring_classifier = copy.copy(classifier)
+    scoring_classifier.model = torch.ao.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8
+    )
+    scoring_classifier.device = "cpu"
+    return scoring_classifier
+
+
+# Backends, which turn the fine-tuned classifier into the classifier used for
+# query scoring and stopping, see CachedPoolBasedActiveLearner.
+SCORING_BACKENDS = {
+    "int8": int8_scoring_copy,
+}
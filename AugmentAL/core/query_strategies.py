@@ -1,5 +1,10 @@
 import numpy as np
+from contextlib import contextmanager
 from datetime import datetime
+from time import perf_counter
+from core.groups import REDUCERS, AugmentationGroups, draw_stratified
+from core.pool import PoolState
+from core.views import IndexedDatasetView
 from small_text.query_strategies import (
     ConfidenceBasedQueryStrategy,
     QueryStrategy,
@@ -12,33 +17,97 @@ class AugmentedQueryStrategyBase(QueryStrategy):
     """
 
     def __init__(
-        self, base_strategy: QueryStrategy, augmented_indices: dict[int, list[int]] = {}
+        self,
+        base_strategy: QueryStrategy,
+        augmented_indices: dict[int, list[int]] | AugmentationGroups = {},
+        single_pass: bool = False,
     ) -> None:
         """Initialize the strategy by providing the augmented_indices for the dataset
             and the
 
         Args:
-            augmented_indices (dict[int, list[int]], optional): A dictionary mapping samples to
-                virtual samples generated based on this one. The key is always one
-                id representing an element from the base set, the value to this
-                will always be a list consisting of ids representing virtual samples
-                generated based on the original one. Defaults to {}.
+            augmented_indices (dict[int, list[int]] | AugmentationGroups, optional):
+                A mapping of samples to virtual samples generated based on this one.
+                The key is always one id representing an element from the base set,
+                the value to this will always be the ids representing virtual samples
+                generated based on the original one. Dicts are converted to
+                AugmentationGroups. Defaults to {}.
+            single_pass (bool, optional): If the base strategy is confidence based,
+                score the pool only once per query and walk the ranking instead of
+                querying the base strategy repeatedly. Defaults to False.
         """
         super().__init__()
-        self.augmented_indices = augmented_indices
-        self.flattened_augmented_values = sorted(
-            {x for v in self.augmented_indices.values() for x in v}
-        )
+        self.augmented_groups = AugmentationGroups.create(augmented_indices)
+        # origin_indices[i] is the index of the original sample row i was
+        # generated from, original rows simply map onto themselves.
+        self.origin_indices = self.augmented_groups.origin_indices
 
         self.base_strategy = base_strategy
+        self.single_pass = single_pass
+        # One dict of timings per query, see begin_query_stats.
+        self.query_stats = []
+        self._query_start = None
+
+    @property
+    def last_query_stats(self) -> dict | None:
+        return self.query_stats[-1] if self.query_stats else None
+
+    def begin_query_stats(self, pool_size: int) -> dict:
+        """Start recording the stats of one query.
+
+        Args:
+            pool_size (int): Number of candidate rows of the query.
+
+        Returns:
+            dict: The stats of this query, which are filled until end_query_stats.
+        """
+        stats = {
+            "pool_size": int(pool_size),
+            "rounds": 0,
+            "inference_seconds": 0.0,
+            "mapping_seconds": 0.0,
+            "total_seconds": 0.0,
+        }
+        self.query_stats.append(stats)
+        self._query_start = perf_counter()
+        return stats
+
+    def end_query_stats(self) -> dict:
+        """Finish the stats of the current query. Everything that was not spent
+        in inference is accounted to index mapping and bookkeeping.
+        """
+        stats = self.query_stats[-1]
+        stats["total_seconds"] = perf_counter() - self._query_start
+        stats["mapping_seconds"] = stats["total_seconds"] - stats["inference_seconds"]
+        self._query_start = None
+        return stats
+
+    @contextmanager
+    def timed_inference(self):
+        """Account the time spent in the block to the inference of the current
+        query, outside of a query nothing is recorded.
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            if self._query_start is not None:
+                self.query_stats[-1]["inference_seconds"] += perf_counter() - start
 
     def get_origin_augmented_index(self, aug_elem_index) -> int:
-        # TODO: More robust by introducing try except for index error
-        return [
-            key
-            for key in self.augmented_indices
-            if (aug_elem_index in self.augmented_indices[key])
-        ][0]
+        return int(self.get_origin_indices([aug_elem_index])[0])
+
+    def get_origin_indices(self, indices) -> np.ndarray:
+        """Map every index onto the index of its original sample.
+
+        Args:
+            indices (array-like): Indices of original or augmented rows.
+
+        Returns:
+            np.ndarray: The original index for every given index. Indices unknown
+                to the augmented groups are treated as originals.
+        """
+        return self.augmented_groups.group_of(indices)
 
     def while_loop_filling_up_indices(
         self,
@@ -49,75 +118,116 @@ class AugmentedQueryStrategyBase(QueryStrategy):
         indices_labeled,
         y,
     ) -> np.ndarray:
-        original_indices_queried: np.ndarray = np.array([], dtype=int)
-        augmented_indices_queried: np.ndarray = np.array([], dtype=int)
-        indices_already_queried: np.ndarray = np.array([], dtype=int)
-
-        print(f"Start while at time: {(datetime.now()).strftime('%H:%M:%S')}")
-        while len(original_indices_queried) < n:
-            query = self.base_strategy.query(
-                clf,
-                dataset,
-                np.setdiff1d(
-                    np.setdiff1d(
-                        np.setdiff1d(
-                            indices_unlabeled,
-                            indices_already_queried,
-                        ),
-                        augmented_indices_queried,
-                    ),
-                    original_indices_queried,
-                ),
-                indices_labeled,
-                y,
-                n - len(original_indices_queried),
+        self.begin_query_stats(len(indices_unlabeled))
+        if self.single_pass and isinstance(
+            self.base_strategy, ConfidenceBasedQueryStrategy
+        ):
+            result = self.single_pass_filling_up_indices(
+                n, clf, dataset, indices_unlabeled, indices_labeled, y
             )
-            indices_already_queried = np.concatenate((indices_already_queried, query))
-
-            # After the query here will be empty_array with the indices of the
-            # original_elements that are queried and calculated,
-            # if the element in the query is an augmented element.
-            original_indices_queried = np.setdiff1d(
-                np.unique(
-                    np.concatenate(
-                        (
-                            original_indices_queried,
-                            [
-                                (
-                                    int(self.get_origin_augmented_index(elem))
-                                    if elem in self.flattened_augmented_values
-                                    else int(elem)
-                                )
-                                for elem in query
-                            ],
-                        ),
-                    )
-                ),
-                indices_labeled,
+        else:
+            result = self.repeated_query_filling_up_indices(
+                n, clf, dataset, indices_unlabeled, indices_labeled, y
             )
-            # After getting the original indices, we use this indices, to calculate
-            # all of the augmented indices that are related to the original indices.
-            augmented_indices_queried = np.setdiff1d(
-                np.unique(
-                    np.concatenate(
-                        (
-                            augmented_indices_queried,
-                            [
-                                int(x)
-                                for xs in [
-                                    self.augmented_indices[x]
-                                    for x in original_indices_queried
-                                ]
-                                for x in xs
-                            ],
-                        ),
-                    )
-                ),
-                indices_labeled,
+        self.end_query_stats()
+        return result
+
+    def repeated_query_filling_up_indices(
+        self,
+        n: int,
+        clf,
+        dataset,
+        indices_unlabeled,
+        indices_labeled,
+        y,
+    ) -> np.ndarray:
+        pool = self.create_pool_state(dataset, indices_unlabeled, indices_labeled)
+        # Originals are flagged in the same row space as the pool.
+        originals_chosen = np.zeros(len(pool), dtype=bool)
+        num_chosen = 0
+
+        print(f"Start while at time: {(datetime.now()).strftime('%H:%M:%S')}")
+        while num_chosen < n:
+            self.query_stats[-1]["rounds"] += 1
+            with self.timed_inference():
+                query = self.base_strategy.query(
+                    clf,
+                    dataset,
+                    pool.candidates(),
+                    indices_labeled,
+                    y,
+                    n - num_chosen,
+                )
+            pool.mark_queried(query)
+
+            # Map the query onto its originals, dropping labeled ones and the
+            # ones that were already chosen in a previous round.
+            origins = self.get_origin_indices(query)
+            origins = np.unique(
+                origins[~pool.is_labeled(origins) & ~originals_chosen[origins]]
             )
+            originals_chosen[origins] = True
+            num_chosen += len(origins)
+            # Neither the originals nor their augmented samples are queried again.
+            pool.exclude(origins)
+            pool.exclude(self.augmented_groups.expand(origins))
         print(f"End while at time: {(datetime.now()).strftime('%H:%M:%S')}")
-        original_indices_queried = original_indices_queried[:n]
-        return original_indices_queried, augmented_indices_queried
+        original_indices_queried = np.flatnonzero(originals_chosen)[:n]
+        return original_indices_queried, self.get_unlabeled_augmented_indices(
+            original_indices_queried, pool
+        )
+
+    def create_pool_state(self, dataset, indices_unlabeled, indices_labeled):
+        return PoolState(len(dataset), indices_unlabeled, indices_labeled)
+
+    def get_unlabeled_augmented_indices(
+        self, original_indices: np.ndarray, pool: PoolState
+    ) -> np.ndarray:
+        """All augmented samples of the given originals, which are not labeled."""
+        augmented_indices = self.augmented_groups.expand(original_indices)
+        return np.sort(augmented_indices[~pool.is_labeled(augmented_indices)])
+
+    def single_pass_filling_up_indices(
+        self,
+        n: int,
+        clf,
+        dataset,
+        indices_unlabeled,
+        indices_labeled,
+        y,
+    ) -> np.ndarray:
+        """Selects the same originals as while_loop_filling_up_indices, but scores
+        the pool only once. The unlabeled rows are ranked by the score of the base
+        strategy and greedily taken until n distinct originals are chosen. Rows of
+        groups that are already taken or labeled are skipped.
+        """
+        indices_unlabeled = np.asarray(indices_unlabeled, dtype=int)
+        pool = self.create_pool_state(dataset, indices_unlabeled, indices_labeled)
+
+        print(f"Start single pass at time: {(datetime.now()).strftime('%H:%M:%S')}")
+        # Lower scores are better, as in ConfidenceBasedQueryStrategy.query.
+        self.query_stats[-1]["rounds"] += 1
+        with self.timed_inference():
+            scores = self.base_strategy.score(
+                clf, dataset, indices_unlabeled, indices_labeled, y
+            )
+        ranking = indices_unlabeled[
+            np.argsort(scores[indices_unlabeled], kind="stable")
+        ]
+        ranked_origins = self.get_origin_indices(ranking)
+
+        # The first occurrence of every original within the ranking is the row
+        # that would have brought the group into the query.
+        origins, first_positions = np.unique(ranked_origins, return_index=True)
+        not_labeled = ~pool.is_labeled(origins)
+        origins = origins[not_labeled]
+        first_positions = first_positions[not_labeled]
+        original_indices_queried = np.sort(origins[np.argsort(first_positions)[:n]])
+
+        print(f"End single pass at time: {(datetime.now()).strftime('%H:%M:%S')}")
+        return original_indices_queried, self.get_unlabeled_augmented_indices(
+            original_indices_queried, pool
+        )
 
 
 class AugmentedOutcomesQueryStrategy(AugmentedQueryStrategyBase):
@@ -132,23 +242,26 @@ class AugmentedOutcomesQueryStrategy(AugmentedQueryStrategyBase):
         in the dataset, as well as indices_unlabeled/labeled. Then we extend
         the return of the query method by adding the augmented indices.
         """
-        original_indices = list(self.augmented_indices.keys())
-        query = self.base_strategy.query(
-            clf,
-            dataset[original_indices],
-            np.intersect1d(indices_unlabeled, original_indices),
-            np.intersect1d(indices_labeled, original_indices),
-            y,
-            n,
-        )
+        # The base strategy scores a view on the originals, so it returns
+        # positions within that view, which are mapped back afterwards.
+        originals = IndexedDatasetView(dataset, self.augmented_groups.originals)
+        positions_unlabeled = originals.to_positions(indices_unlabeled)
+        positions_unlabeled = np.sort(positions_unlabeled[positions_unlabeled >= 0])
+        positions_labeled = originals.to_positions(indices_labeled)
+        stats = self.begin_query_stats(len(positions_unlabeled))
+        stats["rounds"] = 1
+        with self.timed_inference():
+            query_positions = self.base_strategy.query(
+                clf,
+                originals,
+                positions_unlabeled,
+                np.sort(positions_labeled[positions_labeled >= 0]),
+                y,
+                n,
+            )
+        query = originals.to_global(query_positions)
 
-        augmented_indices_for_this_key = [
-            int(x)
-            for xs in [
-                self.augmented_indices[x] for x in query if x in self.augmented_indices
-            ]
-            for x in xs
-        ]
+        augmented_indices_for_this_key = self.augmented_groups.expand(query)
         results = np.concatenate(
             (
                 query,
@@ -156,6 +269,7 @@ class AugmentedOutcomesQueryStrategy(AugmentedQueryStrategyBase):
                 # Get the augmented indices for the query
             )
         )
+        self.end_query_stats()
         return results
 
     def __str__(self):
@@ -205,14 +319,27 @@ class AugmentedSearchSpaceExtensionAndOutcomeQueryStrategy(AugmentedQueryStrateg
 class AverageAcrossAugmentedQueryStrategy(
     AugmentedQueryStrategyBase, ConfidenceBasedQueryStrategy
 ):
-    """Selects instances, where the median of the confidence between
-    a sample and its augmented samples is the lowest.
+    """Selects instances, where the reduced confidence (by default the mean)
+    between a sample and its augmented samples is the lowest.
     """
 
     def __init__(
-        self, base_strategy: QueryStrategy, augmented_indices: dict[int, list[int]] = {}
+        self,
+        base_strategy: QueryStrategy,
+        augmented_indices: dict[int, list[int]] | AugmentationGroups = {},
+        single_pass: bool = False,
+        reducer: str = "mean",
     ) -> None:
-        super().__init__(base_strategy, augmented_indices)
+        """
+        Args:
+            reducer (str, optional): How the confidences of a group are combined,
+                one of mean, median, min, max and variance. Defaults to "mean".
+        """
+        super().__init__(base_strategy, augmented_indices, single_pass)
+
+        if reducer not in REDUCERS:
+            raise ValueError(f"Unknown reducer {reducer}, choose one of {REDUCERS}.")
+        self.reducer = reducer
 
         if not isinstance(base_strategy, ConfidenceBasedQueryStrategy):
             raise TypeError(
@@ -220,26 +347,315 @@ class AverageAcrossAugmentedQueryStrategy(
             )
 
     def query(self, clf, dataset, indices_unlabeled, indices_labeled, y, n=10):
-        return super().query(clf, dataset, indices_unlabeled, indices_labeled, y, n)
+        stats = self.begin_query_stats(len(indices_unlabeled))
+        stats["rounds"] = 1
+        result = super().query(clf, dataset, indices_unlabeled, indices_labeled, y, n)
+        self.end_query_stats()
+        return result
 
     def get_confidence(self, clf, dataset, indices_unlabeled, indices_labeled, y):
         # Use the best confidence from the classifier
-        proba = self.base_strategy.get_confidence(
-            clf, dataset, indices_unlabeled, indices_labeled, y
+        with self.timed_inference():
+            proba = self.base_strategy.get_confidence(
+                clf, dataset, indices_unlabeled, indices_labeled, y
+            )
+
+        proba[self.augmented_groups.originals] = self.augmented_groups.reduce(
+            proba, self.reducer
         )
+        proba[self.augmented_groups.members] = 1 if self.lower_is_better else 0
+        return proba
+
+    def __str__(self):
+        if self.reducer != "mean":
+            return (
+                f"AverageAcrossAugmentedQueryStrategy({self.base_strategy}, "
+                f"reducer={self.reducer})"
+            )
+        return f"AverageAcrossAugmentedQueryStrategy({self.base_strategy})"
 
-        for original_index in self.augmented_indices:
-            proba[original_index] = np.mean(
-                np.concatenate(
-                    (
-                        [proba[original_index]],
-                        [proba[x] for x in self.augmented_indices[original_index]],
-                    )
+
+class _SubsetClassifier:
+    """Wraps a classifier for the duration of one query, so that predict_proba
+    only scores the rows of a candidate subset. All other rows are filled
+    with nan, the query strategy must only rank the candidate rows.
+    """
+
+    def __init__(self, classifier, scored_rows: np.ndarray) -> None:
+        self.classifier = classifier
+        self.scored_rows = scored_rows
+        self._is_scored = np.zeros(scored_rows.max(initial=-1) + 1, dtype=bool)
+        self._is_scored[scored_rows] = True
+        # The fill loops query the base strategy several times per query.
+        self._results = {}
+
+    def __getattr__(self, name):
+        if name in ("classifier", "scored_rows", "_is_scored", "_results"):
+            raise AttributeError(name)
+        return getattr(self.classifier, name)
+
+    def predict_proba(self, data_set, **kwargs) -> np.ndarray:
+        result = self._results.get(id(data_set))
+        if result is not None and result[0] is data_set and not kwargs:
+            return result[1].copy()
+
+        if isinstance(data_set, IndexedDatasetView):
+            dataset, rows = data_set.dataset, data_set.global_indices
+        else:
+            dataset, rows = data_set, np.arange(len(data_set))
+        needed = np.zeros(len(rows), dtype=bool)
+        known = rows < len(self._is_scored)
+        needed[known] = self._is_scored[rows[known]]
+
+        proba_scored = self.classifier.predict_proba(
+            IndexedDatasetView(dataset, rows[needed]), **kwargs
+        )
+        proba = np.full((len(rows), proba_scored.shape[1]), np.nan)
+        proba[needed] = proba_scored
+        if not kwargs:
+            self._results[id(data_set)] = (data_set, proba)
+        return proba.copy()
+
+    def predict(self, data_set, return_proba: bool = False):
+        proba = self.predict_proba(data_set)
+        # Rows outside of the subset have no prediction and are marked with -1.
+        predictions = np.full(len(proba), -1)
+        scored = ~np.isnan(proba).any(axis=1)
+        predictions[scored] = np.argmax(proba[scored], axis=1)
+        if return_proba:
+            return predictions, proba
+        return predictions
+
+
+class SubsampledQueryStrategy(QueryStrategy):
+    """Restricts a query strategy to a random subset of the unlabeled pool.
+
+    Per query, originals are drawn at random (optionally stratified by their
+    predicted class) until roughly subsample_size unlabeled rows are covered, but
+    never fewer than the n groups to query.
+    Augmentation groups are always kept whole, so strategies aggregating over
+    groups still see all members of a candidate. Only the rows of the drawn
+    groups are scored by the classifier.
+    """
+
+    def __init__(
+        self,
+        base_strategy: QueryStrategy,
+        subsample_size: int,
+        augmented_indices: dict[int, list[int]] | AugmentationGroups = {},
+        stratified: bool = False,
+        seed: int | None = None,
+    ) -> None:
+        """
+        Args:
+            base_strategy (QueryStrategy): The strategy that ranks the subset.
+            subsample_size (int): Number of unlabeled rows to score per query.
+            augmented_indices (dict[int, list[int]] | AugmentationGroups, optional):
+                The augmentation groups, which are never split. Defaults to {}.
+            stratified (bool, optional): Draw the originals proportionally to the
+                classes predicted for them. This needs predictions for the whole
+                pool, which are usually served from the prediction cache of the
+                active learner. Defaults to False.
+            seed (int | None, optional): Seed of the random generator.
+                Defaults to None.
+        """
+        super().__init__()
+        self.base_strategy = base_strategy
+        self.subsample_size = subsample_size
+        self.augmented_groups = AugmentationGroups.create(augmented_indices)
+        self.stratified = stratified
+        self.rng = np.random.default_rng(seed)
+
+    def query(self, clf, dataset, indices_unlabeled, indices_labeled, y, n=10):
+        indices_unlabeled = np.asarray(indices_unlabeled, dtype=int)
+        if len(indices_unlabeled) <= self.subsample_size:
+            return self.base_strategy.query(
+                clf, dataset, indices_unlabeled, indices_labeled, y, n
+            )
+
+        candidate_originals = self.draw_originals(
+            clf, dataset, indices_unlabeled, indices_labeled, n
+        )
+        scored_rows = np.concatenate(
+            (candidate_originals, self.augmented_groups.expand(candidate_originals))
+        )
+        origins = self.augmented_groups.group_of(indices_unlabeled)
+        is_candidate = np.zeros(
+            max(origins.max(initial=-1), candidate_originals.max(initial=-1)) + 1,
+            dtype=bool,
+        )
+        is_candidate[candidate_originals] = True
+        candidates = indices_unlabeled[is_candidate[origins]]
+
+        print(f"Scoring {len(candidates)} of {len(indices_unlabeled)} pool rows")
+        # Group based strategies query n distinct groups.
+        return self.base_strategy.query(
+            _SubsetClassifier(clf, scored_rows),
+            dataset,
+            candidates,
+            indices_labeled,
+            y,
+            min(n, len(candidate_originals)),
+        )
+
+    def draw_originals(
+        self, clf, dataset, indices_unlabeled, indices_labeled, n: int
+    ) -> np.ndarray:
+        """Draw originals until about subsample_size unlabeled rows are covered,
+        but at least n of them.
+        """
+        origins = self.augmented_groups.group_of(indices_unlabeled)
+        pool_originals = np.unique(origins)
+        # Group based strategies never query a group, whose original is labeled.
+        open_originals = pool_originals[~np.isin(pool_originals, indices_labeled)]
+        if len(open_originals) > 0:
+            pool_originals = open_originals
+        rows_per_original = len(indices_unlabeled) / len(pool_originals)
+        num_originals = max(n, int(np.ceil(self.subsample_size / rows_per_original)))
+        predicted = clf.predict(dataset)[pool_originals] if self.stratified else None
+        return draw_stratified(self.rng, pool_originals, num_originals, predicted)
+
+    def __str__(self):
+        return (
+            f"SubsampledQueryStrategy({self.base_strategy}, "
+            f"subsample_size={self.subsample_size}, stratified={self.stratified})"
+        )
+
+
+class AugmentedKCenterQueryStrategy(AugmentedQueryStrategyBase):
+    """Selects a diverse batch with greedy k-center on classifier embeddings.
+
+    Every augmentation group is collapsed to one representative embedding, so
+    variants of the same original can never end up in one batch. The
+    representatives of labeled groups are the initial centers. Each selected
+    group becomes a new center, and the distance of every candidate to its
+    closest center is updated incrementally, so a query costs O(pool * batch)
+    distance computations instead of O(pool^2).
+    """
+
+    def __init__(
+        self,
+        augmented_indices: dict[int, list[int]] | AugmentationGroups = {},
+        representative: str = "mean",
+        include_augmented: bool = False,
+        block_size: int = 128,
+        embed_kwargs: dict = {},
+    ) -> None:
+        """
+        Args:
+            representative (str, optional): "mean" averages the embeddings of the
+                original and all of its augmented samples, "original" only embeds
+                the originals, which is cheaper. Defaults to "mean".
+            include_augmented (bool, optional): Also return the unlabeled
+                augmented samples of the selected originals. Defaults to False.
+            block_size (int, optional): Number of centers, whose distances to all
+                candidates are computed at once. Defaults to 128.
+            embed_kwargs (dict, optional): Passed on to clf.embed.
+                Defaults to {}.
+        """
+        super().__init__(None, augmented_indices)
+        if representative not in ("mean", "original"):
+            raise ValueError("representative must be either mean or original.")
+        self.representative = representative
+        self.include_augmented = include_augmented
+        self.block_size = block_size
+        self.embed_kwargs = embed_kwargs
+
+    def query(self, clf, dataset, indices_unlabeled, indices_labeled, y, n=10):
+        stats = self.begin_query_stats(len(indices_unlabeled))
+        stats["rounds"] = 1
+        pool = self.create_pool_state(dataset, indices_unlabeled, indices_labeled)
+        # One candidate per group, groups with a labeled row are centers.
+        candidate_groups = np.unique(self.get_origin_indices(pool.candidates()))
+        labeled_groups = np.unique(self.get_origin_indices(indices_labeled))
+        candidate_groups = candidate_groups[~np.isin(candidate_groups, labeled_groups)]
+        if len(candidate_groups) <= n:
+            original_indices_queried = candidate_groups
+        else:
+            embeddings = self.get_representatives(
+                clf, dataset, np.concatenate((candidate_groups, labeled_groups))
+            )
+            selected = self.greedy_k_center(
+                embeddings[: len(candidate_groups)],
+                embeddings[len(candidate_groups) :],
+                n,
+            )
+            original_indices_queried = np.sort(candidate_groups[selected])
+
+        if self.include_augmented:
+            original_indices_queried = np.concatenate(
+                (
+                    original_indices_queried,
+                    self.get_unlabeled_augmented_indices(
+                        original_indices_queried, pool
+                    ),
                 )
             )
-            for augmented_index in self.augmented_indices[original_index]:
-                proba[augmented_index] = 1 if self.lower_is_better else 0
-        return proba
+        self.end_query_stats()
+        return original_indices_queried
+
+    def get_representatives(self, clf, dataset, groups: np.ndarray) -> np.ndarray:
+        """Embedding of the representative of every given group."""
+        if self.representative == "original":
+            with self.timed_inference():
+                return clf.embed(
+                    IndexedDatasetView(dataset, groups), **self.embed_kwargs
+                )
+
+        with self.timed_inference():
+            embeddings = clf.embed(dataset, **self.embed_kwargs)
+        # Rows without augmented samples represent themselves.
+        embeddings[self.augmented_groups.originals] = self.augmented_groups.reduce(
+            embeddings, "mean"
+        )
+        return embeddings[groups]
+
+    def greedy_k_center(
+        self, candidates: np.ndarray, centers: np.ndarray, n: int
+    ) -> np.ndarray:
+        """Greedy k-center selection of n candidates.
+
+        Args:
+            candidates (np.ndarray): Embeddings of the candidates.
+            centers (np.ndarray): Embeddings of the existing centers, may be empty.
+            n (int): Number of candidates to select.
+
+        Returns:
+            np.ndarray: Positions of the selected candidates, in selection order.
+        """
+        candidates = candidates.astype(np.float32, copy=False)
+        candidate_norms = np.einsum("ij,ij->i", candidates, candidates)
+        min_distances = np.full(len(candidates), np.inf, dtype=np.float32)
+        for start in range(0, len(centers), self.block_size):
+            block = centers[start : start + self.block_size].astype(np.float32)
+            min_distances = np.minimum(
+                min_distances,
+                self._squared_distances(candidates, candidate_norms, block).min(axis=1),
+            )
+        if len(centers) == 0:
+            # Without centers, start with the candidate farthest from the mean.
+            min_distances = self._squared_distances(
+                candidates, candidate_norms, candidates.mean(axis=0, keepdims=True)
+            )[:, 0]
+
+        selected = np.empty(n, dtype=int)
+        for i in range(n):
+            selected[i] = np.argmax(min_distances)
+            min_distances = np.minimum(
+                min_distances,
+                self._squared_distances(
+                    candidates, candidate_norms, candidates[selected[i]][None, :]
+                )[:, 0],
+            )
+            min_distances[selected[i]] = -np.inf
+        return selected
+
+    @staticmethod
+    def _squared_distances(candidates, candidate_norms, block) -> np.ndarray:
+        block_norms = np.einsum("ij,ij->i", block, block)
+        distances = candidate_norms[:, None] + block_norms[None, :]
+        distances -= 2 * candidates @ block.T
+        return np.maximum(distances, 0)
 
     def __str__(self):
-        return f"AverageAcrossAugmentedQueryStrategy({self.base_strategy})"
+        return f"AugmentedKCenterQueryStrategy(representative={self.representative})"
@@ -0,0 +1,178 @@
+import copy
+import os
+import threading
+from collections import OrderedDict
+
+import torch
+
+from small_text import (
+    TransformerBasedClassification,
+    TransformerBasedClassificationFactory,
+)
+from transformers import AutoConfig, AutoModelForSequenceClassification, AutoTokenizer
+from transformers import logging as transformers_logging
+
+DEFAULT_MAX_BYTES = int(os.getenv("MODEL_REGISTRY_MAX_BYTES", 4 * 2**30))
+
+
+def model_bytes(model) -> int:
+    """Memory held by the parameters and buffers of a torch module."""
+    return sum(
+        tensor.numel() * tensor.element_size()
+        for tensor in (*model.parameters(), *model.buffers())
+    )
+
+
+class ModelRegistry:
+    """Tokenizers and pretrained weights, loaded once per process.
+
+    Models are keyed by name, revision and number of classes. Every classifier
+    gets its own copy of the cached model, whose newly added layers, e.g. the
+    classification head, are initialized again, so the copy behaves like a model
+    that was just loaded from disk. Models are evicted least recently used first,
+    as soon as all cached weights take more than max_bytes. Tokenizers are only
+    used for encoding and are shared.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        """
+        Args:
+            max_bytes (int, optional): Memory of all cached models, the most
+                recently used model is kept even if it is larger. Defaults to
+                $MODEL_REGISTRY_MAX_BYTES or 4 GiB.
+        """
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # (name, revision, num_classes) -> (config, model, new_modules, bytes)
+        self._models = OrderedDict()
+        # (name, revision) -> tokenizer
+        self._tokenizers = {}
+        self._lock = threading.RLock()
+
+    @property
+    def cached_bytes(self) -> int:
+        return sum(entry[3] for entry in self._models.values())
+
+    def tokenizer(self, name: str, revision: str = "main", cache_dir: str = None):
+        key = (name, revision)
+        with self._lock:
+            if key not in self._tokenizers:
+                self._tokenizers[key] = AutoTokenizer.from_pretrained(
+                    name, revision=revision, cache_dir=cache_dir
+                )
+            return self._tokenizers[key]
+
+    def model(
+        self,
+        name: str,
+        num_classes: int,
+        revision: str = "main",
+        cache_dir: str = None,
+        local_files_only: bool = False,
+    ):
+        """A copy of the pretrained model for sequence classification.
+
+        Returns:
+            tuple[PretrainedConfig, PreTrainedModel]: Config and model, both owned
+                by the caller.
+        """
+        key = (name, revision, num_classes)
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is None:
+                self.misses += 1
+                entry = self._load(key, cache_dir, local_files_only)
+                self._models[key] = entry
+                self._evict()
+            else:
+                self.hits += 1
+                self._models.move_to_end(key)
+            config, model, new_modules, _ = entry
+            # Copying the weights is much cheaper than reading them from disk.
+            copied = copy.deepcopy(model)
+
+        for module_name in new_modules:
+            copied.get_submodule(module_name).apply(copied._init_weights)
+        return copy.deepcopy(config), copied
+
+    def _load(self, key, cache_dir: str, local_files_only: bool) -> tuple:
+        name, revision, num_classes = key
+        config = AutoConfig.from_pretrained(
+            name, num_labels=num_classes, revision=revision, cache_dir=cache_dir
+        )
+        # Suppress "Some weights of the model checkpoint at [model name] were not [...]"-warnings
+        previous_verbosity = transformers_logging.get_verbosity()
+        transformers_logging.set_verbosity_error()
+        # Loading initializes the new layers, which would draw from the global
+        # RNG on a miss only. Only the re-initialization of every copy may draw,
+        # so a seeded run does not depend on what the process loaded before.
+        try:
+            with torch.random.fork_rng():
+                model, loading_info = (
+                    AutoModelForSequenceClassification.from_pretrained(
+                        name,
+                        config=config,
+                        revision=revision,
+                        cache_dir=cache_dir,
+                        local_files_only=local_files_only,
+                        output_loading_info=True,
+                    )
+                )
+        finally:
+            transformers_logging.set_verbosity(previous_verbosity)
+        # Modules, whose weights are not part of the checkpoint.
+        new_modules = sorted(
+            {weight.rsplit(".", 1)[0] for weight in loading_info["missing_keys"]}
+        )
+        print(f"Loaded {name}@{revision} into the model registry")
+        return config, model, new_modules, model_bytes(model)
+
+    def _evict(self) -> None:
+        while len(self._models) > 1 and self.cached_bytes > self.max_bytes:
+            (name, revision, _), _ = self._models.popitem(last=False)
+            print(f"Evicted {name}@{revision} from the model registry")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._models.clear()
+            self._tokenizers.clear()
+
+
+MODEL_REGISTRY = ModelRegistry()
+
+
+class RegistryTransformerBasedClassification(TransformerBasedClassification):
+    """TransformerBasedClassification, which takes tokenizer and pretrained weights
+    from the MODEL_REGISTRY instead of loading them on every initialization.
+    """
+
+    def __init__(self, *args, revision: str = "main", **kwargs):
+        super().__init__(*args, **kwargs)
+        self.revision = revision
+
+    def initialize_transformer(self, cache_dir):
+        local_files_only = str(os.environ.get("TRANSFORMERS_OFFLINE", "0")) == "1"
+        self.config, self.model = MODEL_REGISTRY.model(
+            self.transformer_model.model,
+            self.num_classes,
+            revision=self.revision,
+            cache_dir=cache_dir,
+            local_files_only=local_files_only,
+        )
+        self.tokenizer = MODEL_REGISTRY.tokenizer(
+            self.transformer_model.tokenizer,
+            revision=self.revision,
+            cache_dir=cache_dir,
+        )
+
+
+class RegistryTransformerBasedClassificationFactory(
+    TransformerBasedClassificationFactory
+):
+    """Creates RegistryTransformerBasedClassification instances."""
+
+    def new(self) -> RegistryTransformerBasedClassification:
+        return RegistryTransformerBasedClassification(
+            self.transformer_model_args, self.num_classes, **self.kwargs
+        )
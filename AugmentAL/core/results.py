@@ -0,0 +1,42 @@
+import fcntl
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+
+def _to_json(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class JsonlResultsSink:
+    """Appends one JSON record per iteration to a results file.
+
+    Every append writes a single line to the end of the file, so its cost does
+    not grow with the results already written. The fields given on creation,
+    e.g. query strategy and repetition, are added to every record. Several
+    processes can append to the same file, the appends are locked.
+    """
+
+    def __init__(self, path: str | Path, fields: dict = {}) -> None:
+        """
+        Args:
+            path (str | Path): The JSONL file, created if missing.
+            fields (dict, optional): Fields of every record of this sink.
+        """
+        self.path = Path(path)
+        self.fields = dict(fields)
+
+    def append(self, record: dict) -> None:
+        line = json.dumps({**self.fields, **record}, default=_to_json) + "\n"
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            os.write(fd, line.encode())
+        finally:
+            os.close(fd)
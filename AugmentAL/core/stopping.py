@@ -0,0 +1,123 @@
+import numpy as np
+from core.groups import AugmentationGroups, draw_stratified
+from small_text import ClassificationChange, DeltaFScore, KappaAverage
+
+# name -> (criterion class, name of its threshold argument, only for binary tasks)
+STOPPING_CRITERION_TYPES = {
+    "kappa_average": (KappaAverage, "kappa", False),
+    "delta_f_score": (DeltaFScore, "threshold", True),
+    "classification_change": (ClassificationChange, "threshold", False),
+}
+
+# Every criterion is configured in three variants:
+# Conservative, which will be the default one of small-text (None),
+# Middle ground, which will be a bit more aggressive and
+# Aggressive, which will be the most aggressive one.
+DEFAULT_STOPPING_CRITERIA = {
+    "kappa_average": {"conservative": None, "middle_ground": 0.9, "aggressive": 0.8},
+    "delta_f_score": {"conservative": None, "middle_ground": 0.07, "aggressive": 0.09},
+    "classification_change": {
+        "conservative": None,
+        "middle_ground": 0.04,
+        "aggressive": 0.09,
+    },
+}
+
+
+class StoppingCriteria:
+    """All stopping criteria of a run, configured once and evaluated together.
+
+    Every variant of every criterion is fed the same prediction array per
+    iteration, so adding a threshold only adds the cheap comparison of two
+    prediction arrays. The responses are kept in one columnar history with a
+    column named {criterion}_{variant}_history per variant.
+    """
+
+    def __init__(
+        self,
+        num_classes: int,
+        criteria: dict[str, dict[str, float | None]] = DEFAULT_STOPPING_CRITERIA,
+    ) -> None:
+        """
+        Args:
+            num_classes (int): Number of labels.
+            criteria (dict[str, dict[str, float | None]], optional): Maps the name
+                of a criterion in STOPPING_CRITERION_TYPES to its variants, which
+                map a variant name to a threshold. None uses the default threshold
+                of small-text. Defaults to DEFAULT_STOPPING_CRITERIA.
+        """
+        self.num_classes = num_classes
+        self.criteria = {}
+        for name, variants in criteria.items():
+            if name not in STOPPING_CRITERION_TYPES:
+                raise ValueError(
+                    f"Unknown stopping criterion {name}, choose one of "
+                    f"{list(STOPPING_CRITERION_TYPES)}."
+                )
+            criterion_type = STOPPING_CRITERION_TYPES[name]
+            criterion_class, threshold_argument, binary_only = criterion_type
+            for variant, threshold in variants.items():
+                kwargs = {} if threshold is None else {threshold_argument: threshold}
+                # Criteria, which do not support the task, never stop.
+                self.criteria[f"{name}_{variant}_history"] = (
+                    criterion_class(num_classes, **kwargs)
+                    if not binary_only or num_classes == 2
+                    else None
+                )
+        self.history = {column: [] for column in self.criteria}
+
+    def stop(self, predictions: np.ndarray) -> dict[str, bool]:
+        """Evaluate every criterion on the same predictions.
+
+        Args:
+            predictions (np.ndarray): Predictions for the stopping set of this
+                iteration.
+
+        Returns:
+            dict[str, bool]: The response of every criterion, by history column.
+        """
+        responses = {
+            column: (
+                bool(criterion.stop(predictions=predictions))
+                if criterion is not None
+                else False
+            )
+            for column, criterion in self.criteria.items()
+        }
+        for column, response in responses.items():
+            self.history[column].append(response)
+        return responses
+
+
+def select_stopping_indices(
+    num_rows: int,
+    augmented_groups: AugmentationGroups,
+    stopping_set: str | int = "all",
+    seed: int | None = None,
+) -> np.ndarray | None:
+    """Choose the rows the stopping criteria are evaluated on, once per run.
+
+    The choice does not look at any labels, the stopping criteria are meant to
+    work without the labels of the pool.
+
+    Args:
+        num_rows (int): Number of rows of the training set.
+        augmented_groups (AugmentationGroups): Augmentation groups of the training
+            set, empty if it is not augmented.
+        stopping_set (str | int, optional): "all" for the whole training set,
+            "originals" for all original rows, or the size of a uniform random
+            sample of originals. Defaults to "all".
+        seed (int | None, optional): Seed for drawing the sample.
+
+    Returns:
+        np.ndarray | None: Sorted indices of the stopping set, None for "all".
+    """
+    if stopping_set == "all":
+        return None
+    rows = np.arange(num_rows)
+    originals = np.flatnonzero(rows == augmented_groups.group_of(rows))
+    if stopping_set == "originals":
+        return originals
+    if not isinstance(stopping_set, int):
+        raise ValueError("stopping_set must be all, originals or a sample size.")
+    return draw_stratified(np.random.default_rng(seed), originals, stopping_set)
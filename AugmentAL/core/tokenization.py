@@ -0,0 +1,110 @@
+import hashlib
+import os
+from pathlib import Path
+
+import numpy as np
+
+
+def default_cache_dir() -> Path:
+    """$TOKENIZATION_CACHE, or ~/.cache/augmental/tokens if it is not set."""
+    return Path(
+        os.getenv("TOKENIZATION_CACHE", Path.home() / ".cache" / "augmental" / "tokens")
+    )
+
+
+def dataset_fingerprint(dataset) -> str:
+    """The fingerprint of a hf dataset, or a hash of its texts and labels."""
+    fingerprint = getattr(dataset, "_fingerprint", None)
+    if fingerprint:
+        return fingerprint
+    digest = hashlib.sha256()
+    for text, label in zip(dataset["text"], dataset["label"]):
+        digest.update(f"{label}\t{text}\n".encode())
+    return digest.hexdigest()
+
+
+class TokenizationCache:
+    """Input ids and attention masks of tokenized datasets, stored as .npy files.
+
+    An entry is keyed by the dataset fingerprint, the tokenizer name and the
+    max_length. Entries are opened as memory maps, so that all runs on a machine
+    share the same page cache instead of tokenizing and holding their own copy.
+    """
+
+    def __init__(self, cache_dir: str | Path | None = None) -> None:
+        """
+        Args:
+            cache_dir (str | Path | None, optional): Directory of the entries.
+                Defaults to default_cache_dir(), read when the cache is created.
+        """
+        self.cache_dir = Path(
+            cache_dir if cache_dir is not None else default_cache_dir()
+        )
+
+    def entry_dir(self, dataset, tokenizer_name: str, max_length: int) -> Path:
+        key = f"{dataset_fingerprint(dataset)}_{tokenizer_name}_{max_length}"
+        return self.cache_dir / hashlib.sha256(key.encode()).hexdigest()[:32]
+
+    def load(self, entry_dir: Path) -> tuple[np.ndarray, np.ndarray] | None:
+        """Memory map an entry, None if it does not exist yet."""
+        try:
+            # Copy on write, torch.from_numpy warns about read-only arrays. Pages
+            # are only copied if a tensor is ever written, which does not happen.
+            return (
+                np.load(entry_dir / "input_ids.npy", mmap_mode="c"),
+                np.load(entry_dir / "attention_mask.npy", mmap_mode="c"),
+            )
+        except FileNotFoundError:
+            return None
+
+    def save(
+        self, entry_dir: Path, input_ids: np.ndarray, attention_mask: np.ndarray
+    ) -> None:
+        entry_dir.mkdir(parents=True, exist_ok=True)
+        # The mask is renamed last, an entry without it is never loaded.
+        for name, array in (
+            ("input_ids", input_ids),
+            ("attention_mask", attention_mask),
+        ):
+            tmp_path = entry_dir / f".{name}.{os.getpid()}.npy"
+            np.save(tmp_path, array)
+            os.replace(tmp_path, entry_dir / f"{name}.npy")
+
+    def get_or_tokenize(
+        self, dataset, tokenizer_factory, tokenizer_name: str, max_length: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Load the tokens of the dataset, tokenize and store them on a miss.
+
+        Args:
+            dataset (datasets.Dataset): A hf dataset with a text column.
+            tokenizer_factory (Callable): Creates the tokenizer, only called on a
+                miss.
+            tokenizer_name (str): Name of the tokenizer, part of the key.
+            max_length (int): Length, to which every text is padded or truncated.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Memory mapped input ids and attention
+                masks, one row per text.
+        """
+        entry_dir = self.entry_dir(dataset, tokenizer_name, max_length)
+        tokens = self.load(entry_dir)
+        if tokens is not None:
+            print(f"Loaded tokens from {entry_dir}")
+            return tokens
+
+        encoded = tokenizer_factory()(
+            list(dataset["text"]),
+            add_special_tokens=True,
+            padding="max_length",
+            max_length=max_length,
+            return_attention_mask=True,
+            truncation="longest_first",
+            return_tensors="np",
+        )
+        self.save(
+            entry_dir,
+            encoded["input_ids"].astype(np.int64),
+            encoded["attention_mask"].astype(np.int64),
+        )
+        print(f"Stored tokens in {entry_dir}")
+        return self.load(entry_dir)
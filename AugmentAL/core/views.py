@@ -0,0 +1,88 @@
+from collections.abc import Sequence
+
+import numpy as np
+
+
+class _IndexedRows(Sequence):
+    """Lazy sequence over the rows of another sequence, without copying them."""
+
+    def __init__(self, rows, indices: np.ndarray) -> None:
+        self._rows = rows
+        self._indices = indices
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return _IndexedRows(self._rows, self._indices[position])
+        return self._rows[int(self._indices[position])]
+
+    def __len__(self) -> int:
+        return len(self._indices)
+
+
+class IndexedDatasetView:
+    """Read-only view on some rows of a TransformersDataset.
+
+    The view can be handed to a classifier or query strategy instead of
+    dataset[indices]. It only stores the selected indices, the token tensors stay
+    in the underlying dataset. Position i of the view is the row
+    global_indices[i] of the dataset.
+    """
+
+    def __init__(self, dataset, indices) -> None:
+        """
+        Args:
+            dataset (TransformersDataset): The dataset to view.
+            indices (array-like): The rows of the dataset, which make up the view.
+        """
+        if isinstance(dataset, IndexedDatasetView):
+            indices = dataset.global_indices[np.asarray(indices, dtype=int)]
+            dataset = dataset.dataset
+        self.dataset = dataset
+        self.global_indices = np.asarray(indices, dtype=int)
+        self._positions = None
+
+    def __len__(self) -> int:
+        return len(self.global_indices)
+
+    def __getitem__(self, item) -> "IndexedDatasetView":
+        return IndexedDatasetView(self.dataset, self.global_indices[item])
+
+    def __getattr__(self, name):
+        # Everything that does not depend on the selected rows, e.g. multi_label
+        # or target_labels, is taken from the underlying dataset.
+        if name == "dataset":
+            raise AttributeError(name)
+        return getattr(self.dataset, name)
+
+    @property
+    def data(self) -> Sequence:
+        return _IndexedRows(self.dataset.data, self.global_indices)
+
+    @property
+    def x(self) -> Sequence:
+        return _IndexedRows(self.dataset.x, self.global_indices)
+
+    @property
+    def y(self) -> np.ndarray:
+        return self.dataset.y[self.global_indices]
+
+    def to_global(self, positions) -> np.ndarray:
+        """Map positions within the view onto indices of the dataset."""
+        return self.global_indices[np.asarray(positions, dtype=int)]
+
+    def to_positions(self, indices) -> np.ndarray:
+        """Map indices of the dataset onto positions within the view.
+
+        Returns:
+            np.ndarray: The position of every index, -1 for indices not in the view.
+        """
+        if self._positions is None:
+            self._positions = np.full(
+                self.global_indices.max(initial=-1) + 1, -1, dtype=int
+            )
+            self._positions[self.global_indices] = np.arange(len(self))
+        indices = np.asarray(indices, dtype=int)
+        positions = np.full(len(indices), -1, dtype=int)
+        known = indices < len(self._positions)
+        positions[known] = self._positions[indices[known]]
+        return positions
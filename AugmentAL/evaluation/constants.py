@@ -120,6 +120,9 @@ LATEX_IMAGES_PATH = "/Users/dennis/Library/Mobile Documents/com~apple~CloudDocs/
 QUERY_STRATEGY_COLUMN = "query_strategy"
 DATASET_COLUMN = "dataset"
 AUGMENTATION_METHOD_COLUMN = "augmentation_method"
+# Written by script.py next to the results of a deduplicated pool, it holds no
+# results.
+DEDUPLICATION_STATS_FILE = "deduplication.json"
 
 STOPPING_CRITERIA = [
     "kappa_average_conservative_history",
@@ -1,3 +1,4 @@
+import json
 import os
 from pathlib import Path
 
@@ -5,6 +6,7 @@ import pandas as pd
 from constants import (
     AUGMENTATION_METHOD_COLUMN,
     DATASET_COLUMN,
+    DEDUPLICATION_STATS_FILE,
     QUERY_STRATEGY_COLUMN,
     AugmentedPaths,
     BasePaths,
@@ -29,7 +31,11 @@ def get_json_files(folder_name: str):
     json_files = []
     for file_name in os.listdir(folder_path):
         file_path = os.path.join(folder_path, file_name)
-        if os.path.isfile(file_path) and file_name.endswith(".json"):
+        if (
+            os.path.isfile(file_path)
+            and file_name.endswith(".json")
+            and file_name != DEDUPLICATION_STATS_FILE
+        ):
             json_files.append(file_path)
     return json_files
 
@@ -81,6 +87,83 @@ def extend_frames(frames, file, folder_name):
     return frames
 
 
+def get_jsonl_files(folder_name: str):
+    """
+    Get all JSONL files with the streamed iterations in the given results folder.
+
+    Args:
+        - folder_name (str): The folder, relative to the results folder.
+
+    Returns:
+        - list: List of JSONL files.
+    """
+    root_folder = str(Path(__file__).parent / "../results")
+    folder_path = os.path.join(root_folder, folder_name)
+    return [
+        os.path.join(folder_path, file_name)
+        for file_name in os.listdir(folder_path)
+        if file_name.endswith(".jsonl")
+    ]
+
+
+def read_jsonl_runs(file) -> dict:
+    """
+    Read a JSONL results file into one column dict per run, like the dicts of the JSON files.
+
+    Iterations repeated by a resumed run replace the earlier ones and a line cut off by a
+    killed run is skipped.
+
+    Returns:
+        - dict: (query strategy, repetition) -> column -> list of values per iteration.
+    """
+    records = {}
+    with open(file, "r") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.decoder.JSONDecodeError:
+                continue
+            run = (record.pop("query_strategy"), record.pop("repetition"))
+            records.setdefault(run, {})[record["iterations"]] = record
+    runs = {}
+    for run, iterations in records.items():
+        columns = {}
+        for iteration in sorted(iterations):
+            for column, value in iterations[iteration].items():
+                columns.setdefault(column, []).append(value)
+        runs[run] = columns
+    return runs
+
+
+def extend_frames_from_jsonl(frames, file, folder_name):
+    augmentation_methods = (
+        ["BERT", "Random Swap", "Synonym", "Backtranslation"]
+        if "None" in folder_name
+        else [folder_name.split("/")[0]]
+    )
+    runs = read_jsonl_runs(file)
+    for augmentation_method in augmentation_methods:
+        for (query_strategy, _), columns in runs.items():
+            # Stopping criteria are missing for the first iteration, they are padded
+            # at the end just like the columns of the JSON files.
+            frame = pd.DataFrame(pad_dict_list(columns, False))
+            frame[QUERY_STRATEGY_COLUMN] = query_strategy
+            frame[AUGMENTATION_METHOD_COLUMN] = augmentation_method
+            frame[DATASET_COLUMN] = folder_name.split("/")[1]
+            frames.append(frame)
+    return frames
+
+
+def create_complete_frame_from_jsonl(folder_name: str) -> tuple[pd.DataFrame, int]:
+    frames = []
+    for file in get_jsonl_files(f"None/{folder_name.split('/')[1]}"):
+        frames = extend_frames_from_jsonl(frames, file, folder_name)
+    for file in get_jsonl_files(folder_name):
+        frames = extend_frames_from_jsonl(frames, file, folder_name)
+
+    return pd.concat(frames), len(frames)
+
+
 def create_complete_frame(folder_name: str) -> tuple[pd.DataFrame, int]:
     frames = []
     for file in get_json_files(f"None/{folder_name.split('/')[1]}"):
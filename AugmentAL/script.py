@@ -1,18 +1,36 @@
 print("LETS GET STARTED")
+import fcntl
+import importlib.util
 import os
 import json
+import shutil
+import zlib
+import numpy as np
 import pandas as pd
+import torch
 
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
 
-from core.augment import create_augmented_dataset
+from core.augment import create_augmented_dataset, deduplicate_augmented_dataset
 from core.constants import AugmentationMethods, Datasets, TransformerModels
-from core.loop import run_active_learning_loop
+from core.groups import AugmentationGroups
+from core.results import JsonlResultsSink
+from core.loop import SEED, create_warm_start, run_active_learning_loop
 from datasets import load_dataset, load_from_disk
 from torch.multiprocessing import set_start_method
 import multiprocessing as mp
 
+# The file names, which the evaluation skips, are defined next to its other
+# constants. evaluation/constants.py is loaded on its own, since the evaluation
+# package imports its plotting modules.
+_spec = importlib.util.spec_from_file_location(
+    "evaluation_constants", Path(__file__).parent / "evaluation" / "constants.py"
+)
+evaluation_constants = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(evaluation_constants)
+
 # mp.set_start_method('spawn')
 # print("START METHOD WAS SET WITH MP LIB")
 
@@ -45,13 +63,13 @@ def create_raw_set(
         augmentation_method (AugmentationMethods | None, optional): The augmentation method, available ones can be found at given enum. Defaults to None.
 
     Returns:
-        tuple(dataset, dataset, dict): Raw sets and augmented indices, if augmentation_method is not None, else just the sets and an empty dict.
+        tuple(dataset, dataset, AugmentationGroups): Raw sets and augmented indices, if augmentation_method is not None, else just the sets and empty groups.
     """
     if "tweet" in dataset_name:
         loaded_dataset = load_dataset(dataset_name, "irony")
     else:
         loaded_dataset = load_dataset(dataset_name)
-    augmented_indices = {}
+    augmented_indices = AugmentationGroups.from_dict({})
     if augmentation_method:
         # Try to load a local already augmented dataset if it exists.
         potential_training_set_path = (
@@ -65,11 +83,7 @@ def create_raw_set(
             raw_test = loaded_dataset["test"]
             print(raw_train, "In loading mode")
             print(raw_test)
-            print(f"{potential_training_set_path}/augmented_indices.json")
-            with open(
-                f"{potential_training_set_path}/augmented_indices.json", "r"
-            ) as f:
-                augmented_indices = {int(k): v for k, v in json.load(f).items()}
+            augmented_indices = AugmentationGroups.load(potential_training_set_path)
         else:
             raw_train, augmented_indices = create_augmented_dataset(
                 loaded_dataset["train"],
@@ -86,23 +100,195 @@ def create_raw_set(
     return raw_test, raw_train, augmented_indices
 
 
+def cell_seed(query_strategy: str, repetition: int) -> int:
+    """Seed of one (query strategy, repetition) cell, independent of the order
+    and the process in which the cells are run.
+    """
+    entropy = [SEED, zlib.crc32(query_strategy.encode()), repetition]
+    return int(np.random.SeedSequence(entropy).generate_state(1)[0])
+
+
+def load_results(results_path: Path) -> dict:
+    try:
+        with open(results_path, "r") as f:
+            return {int(k): v for k, v in json.load(f).items()}
+    except (FileNotFoundError, json.decoder.JSONDecodeError):
+        return {}
+
+
+def save_cell_results(results_path: Path, repetition: int, results) -> None:
+    """Merge the results of one repetition into the results file.
+
+    The file is locked while it is read, merged and replaced, so concurrent
+    workers and jobs never lose each other's repetitions.
+    """
+    with open(results_path.with_name(f".{results_path.name}.lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        final_results = load_results(results_path)
+        final_results[repetition] = {"0": results[0], "1": results[1]}
+        tmp_path = results_path.with_name(f".{results_path.name}.tmp")
+        with open(tmp_path, "w") as f:
+            f.write(pd.DataFrame(final_results).to_json())
+        os.replace(tmp_path, results_path)
+
+
+def repetition_seed(repetition: int) -> int:
+    """Seed shared by all query strategies of a repetition with a shared warm start."""
+    return cell_seed("", repetition)
+
+
+# Datasets of a worker process, set once by init_worker instead of per task.
+_worker_data = None
+
+
+def init_worker(torch_threads: int, raw_test, raw_train, augmented_indices):
+    global _worker_data
+    # Bound the threads of every worker, so that they do not oversubscribe the CPU.
+    torch.set_num_threads(torch_threads)
+    _worker_data = (raw_test, raw_train, augmented_indices)
+
+
+def run_cell(
+    raw_test,
+    raw_train,
+    augmented_indices,
+    cell: tuple,
+    device: str,
+    seed: int | None = None,
+    warm_start_snapshot=None,
+    dynamic_padding: bool = True,
+):
+    """Run one (query strategy, repetition) cell and merge it into its results file."""
+    query_strategy, repetition, run_dir, results_path = cell
+    print(f"STARTING TO RUN ACTIVE LEARNING LOOP {query_strategy} #{repetition}")
+    results = run_active_learning_loop(
+        raw_test,
+        raw_train,
+        augmented_indices,
+        num_queries=num_queries,
+        num_samples=num_samples,
+        num_augmentations=(
+            num_augmentations
+            if query_strategy != "BreakingTies" or query_strategy != "RandomSampling"
+            else 0
+        ),
+        query_strategy=query_strategy,
+        model=TransformerModels.BERT.value,
+        device=device,
+        run_dir=run_dir,
+        seed=seed if seed is not None else cell_seed(query_strategy, repetition),
+        warm_start_snapshot=warm_start_snapshot,
+        dynamic_padding=dynamic_padding,
+        # Every iteration is streamed next to the per repetition results.
+        results_sink=JsonlResultsSink(
+            results_path.with_suffix(".jsonl"),
+            {"query_strategy": query_strategy, "repetition": repetition},
+        ),
+    )
+    save_cell_results(results_path, repetition, results)
+    # The repetition is persisted, its checkpoints are not needed anymore.
+    shutil.rmtree(run_dir, ignore_errors=True)
+
+
+def run_task(
+    raw_test,
+    raw_train,
+    augmented_indices,
+    cells: list[tuple],
+    device: str,
+    shared_warm_start: bool,
+    dynamic_padding: bool = True,
+):
+    """Run cells one after another. With a shared warm start, the cells are the
+    query strategies of one repetition and fork the same warm-started model.
+    """
+    if not shared_warm_start:
+        for cell in cells:
+            run_cell(
+                raw_test,
+                raw_train,
+                augmented_indices,
+                cell,
+                device,
+                dynamic_padding=dynamic_padding,
+            )
+        return
+
+    seed = repetition_seed(cells[0][1])
+    print(f"WARM STARTING REPETITION #{cells[0][1]}")
+    warm_start_snapshot = create_warm_start(
+        raw_test,
+        raw_train,
+        augmented_indices,
+        model=TransformerModels.BERT.value,
+        device=device,
+        seed=seed,
+        dynamic_padding=dynamic_padding,
+    )
+    for cell in cells:
+        run_cell(
+            raw_test,
+            raw_train,
+            augmented_indices,
+            cell,
+            device,
+            seed=seed,
+            warm_start_snapshot=warm_start_snapshot,
+            dynamic_padding=dynamic_padding,
+        )
+
+
+def run_worker_task(*args):
+    return run_task(*_worker_data, *args)
+
+
 def run_script(
     augmentation_method: AugmentationMethods | None = None,
     repetitions: int = 5,
     query_strategies: list = [],
     dataset: str = Datasets.IMDB.value,
+    num_workers: int = 1,
+    torch_threads: int | None = None,
+    device: str = "cuda",
+    shared_warm_start: bool = False,
+    deduplicate: bool = False,
+    dynamic_padding: bool = True,
 ):
+    """Run repetitions of the active learning loop for every query strategy.
+
+    Args:
+        num_workers (int, optional): Number of processes, which run (query
+            strategy, repetition) cells concurrently. Defaults to 1, which runs
+            them one after another in this process.
+        torch_threads (int | None, optional): Torch threads per worker. Defaults
+            to the CPU cores divided by num_workers.
+        device (str, optional): Device of the classifiers. Defaults to "cuda".
+        shared_warm_start (bool, optional): Tokenize the datasets and train the
+            initial model once per repetition, all query strategies of the
+            repetition start from it with the same seed. Defaults to False.
+        deduplicate (bool, optional): Drop augmented samples with the same text
+            as another sample of their group. The results go to the results
+            folder of the augmentation method with a _deduplicated suffix, next
+            to the reduction in deduplication.json. Defaults to False.
+        dynamic_padding (bool, optional): Predict the pool in length buckets,
+            False pads every text to the maximal length. Defaults to True.
+
+    Workers are spawned, so scripts with num_workers > 1 have to call run_script
+    under if __name__ == "__main__".
+    """
     start_time = datetime.now()
     print(f"Starting run at {start_time}. \n")
+    # Results of a deduplicated pool are kept apart from the ones of the full pool.
+    variant = "_deduplicated" if deduplicate and augmentation_method else ""
     path = (
         Path(__file__).parent
         / "results"
-        / str(augmentation_method).replace(" ", "_")
+        / (str(augmentation_method).replace(" ", "_") + variant)
         / dataset
     ).resolve()
 
     try:
-        os.mkdir(path)
+        os.makedirs(path)
         print(f"Directory {path} successfully created.")
     except OSError:
         print(f"{path} already exists.")
@@ -110,6 +296,12 @@ def run_script(
     raw_test, raw_train, augmented_indices = create_raw_set(
         dataset, augmentation_method
     )
+    if variant:
+        raw_train, augmented_indices, deduplication_stats = (
+            deduplicate_augmented_dataset(raw_train, augmented_indices)
+        )
+        with open(path / evaluation_constants.DEDUPLICATION_STATS_FILE, "w") as f:
+            json.dump(deduplication_stats, f)
     print("DATASET was loaded")
     if not query_strategies:
         query_strategies = (
@@ -130,45 +322,57 @@ def run_script(
             ]
         )
 
+    # Every call adds repetitions after the ones already in the results file.
+    cells = []
     for query_strategy in query_strategies:
-        print(query_strategy)
-        final_results = {}
-
-        for rep in range(repetitions):
-            saving_name = f"{query_strategy}_{num_queries}_queries_num_samples_{num_samples}_num_augmentations_{num_augmentations}.json"
-            print(saving_name)
-            try:
-                with open((path / saving_name).resolve(), "r") as f:
-                    try:
-                        loaded_json = json.load(f).items()
-                        final_results = {int(k): v for k, v in loaded_json}
-                        keys = [int(k) for k in final_results.keys()]
-                        keys.sort()
-                        actual_repetition = keys[-1] + 1
-                    except json.decoder.JSONDecodeError:
-                        actual_repetition = rep
-            except FileNotFoundError:
-                actual_repetition = rep
-            print("STARTING TO RUN ACTIVE LEARNING LOOP")
-            results = run_active_learning_loop(
+        saving_name = f"{query_strategy}_{num_queries}_queries_num_samples_{num_samples}_num_augmentations_{num_augmentations}.json"
+        results_path = (path / saving_name).resolve()
+        first_repetition = max(load_results(results_path), default=-1) + 1
+        for repetition in range(first_repetition, first_repetition + repetitions):
+            # Checkpoints of the repetition, an interrupted job resumes from them.
+            run_dir = path / "checkpoints" / f"{query_strategy}_{repetition}"
+            cells.append((query_strategy, repetition, run_dir, results_path))
+
+    if shared_warm_start:
+        # One task per repetition, its strategies share the warm start.
+        tasks = {}
+        for cell in cells:
+            tasks.setdefault(cell[1], []).append(cell)
+        tasks = list(tasks.values())
+    else:
+        tasks = [[cell] for cell in cells]
+
+    if num_workers == 1:
+        if torch_threads is not None:
+            torch.set_num_threads(torch_threads)
+        for task in tasks:
+            run_task(
                 raw_test,
                 raw_train,
                 augmented_indices,
-                num_queries=num_queries,
-                num_samples=num_samples,
-                num_augmentations=num_augmentations
-                if query_strategy != "BreakingTies"
-                or query_strategy != "RandomSampling"
-                else 0,
-                query_strategy=query_strategy,
-                model=TransformerModels.BERT.value,
-                device="cuda",
+                task,
+                device,
+                shared_warm_start,
+                dynamic_padding,
             )
-
-            final_results[actual_repetition] = {"0": results[0], "1": results[1]}
-
-            with open((path / saving_name).resolve(), "w") as f:
-                f.write(pd.DataFrame(final_results).to_json())
+    else:
+        torch_threads = torch_threads or max(1, os.cpu_count() // num_workers)
+        # Spawned workers do not inherit the CUDA or thread state of this process.
+        with ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=mp.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(torch_threads, raw_test, raw_train, augmented_indices),
+        ) as executor:
+            # Workers merge their results into the files themselves.
+            futures = [
+                executor.submit(
+                    run_worker_task, task, device, shared_warm_start, dynamic_padding
+                )
+                for task in tasks
+            ]
+            for future in as_completed(futures):
+                future.result()
 
     end_time = datetime.now()
     print(f"Finished run at {end_time}. \n")